@@ -1,310 +1,449 @@
 ###Importing the libraries
+import argparse
 import os
-import numpy as np
+import sys
+from itertools import combinations
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import scipy.stats as stats
-from scipy.stats import chi2_contingency
+import turbine_cleaning
+import turbine_compact
+import turbine_cube
+import turbine_imputation
+import turbine_profiling
+import turbine_refresh
+import turbine_snapshot
+import turbine_render
+import turbine_spatial
+from turbine_association import association_table
+from turbine_cleaning import clean_dataset
+from turbine_correlation import correlation_matrix, correlation_strength
+from turbine_profiling import stage
 
 
-###Setting the working directory mac
-script_path = os.path.dirname(os.path.abspath(__file__))
-os.chdir(script_path)
+###Settings
+#Default location of the United States Wind Turbine Database csv, next to this script
+DEFAULT_DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'United_States_Wind_Turbine_Database.csv')
+
+#The dataset the analysis and graph functions work on and its snapshot key, set by load_dataset or set_dataset
+dataset = None
+dataset_key = None
+
+#Columns whose average by year graphs are rendered by default, the other numerical columns are identifiers and coordinates whose averages mean nothing
+AVERAGE_BY_YEAR_COLUMNS = turbine_imputation.DIMENSION_COLUMNS + ['project_capacity']
+
+#Copy-on-write is always on from pandas 3, before that it is only on when enabled with pd.options.mode.copy_on_write = True
+_COPY_ON_WRITE = int(pd.__version__.split('.')[0]) >= 3 or pd.options.mode.copy_on_write is True
+
 
 ###Importing the dataset
-raw_dataset = pd.read_csv('United_States_Wind_Turbine_Database.csv')
-print(raw_dataset.head())
-print(raw_dataset.info())
-print(raw_dataset.shape)
-
-###Checking for missing values
-print(raw_dataset.isnull().sum())
-
-###Data cleaning
-
-#drop the t_img_date column
-dataset = raw_dataset.drop(['t_img_date'], axis=1)
-#checking to make sure the column was dropped and no null values
-print(dataset.isnull().sum())
-
-#Changing the column names where every 't_' is replaced with 'turbine_'
-dataset.columns = dataset.columns.str.replace('t_', 'turbine_')
-#Changing the column names where every 'p_' is replaced with 'project_'
-dataset.columns = dataset.columns.str.replace('p_', 'project_')
-#Changing the column name of project_cap to project_capacity
-dataset.rename(columns={'project_cap':'project_capacity'}, inplace=True)
-#Changing the column name of turbine_cap to turbine_capacity
-dataset.rename(columns={'turbine_cap':'turbine_capacity'}, inplace=True)
-#Changing the column name of turbine_manu to turbine_manufacturer
-dataset.rename(columns={'turbine_manu':'turbine_manufacturer'}, inplace=True)
-#Changing the column name of turbine_hh to turbine_hub_height
-dataset.rename(columns={'turbine_hh':'turbine_hub_height'}, inplace=True)
-#Changing the column name of turbine_rd to turbine_rotor_diameter
-dataset.rename(columns={'turbine_rd':'turbine_rotor_diameter'}, inplace=True)
-#Changing the column name of turbine_rsa to turbine_rotor_swept_area
-dataset.rename(columns={'turbine_rsa':'turbine_rotor_swept_area'}, inplace=True)
-#Changing the column name of turbine_ttlh to turbine_tower_total_height
-dataset.rename(columns={'turbine_ttlh':'turbine_tower_total_height'}, inplace=True)
-
-#Checking to make sure the column names were changed
-print(dataset.columns)
-
-#Initial summary statistics table
-print(dataset.describe())
-#Summary stats for the numerical columns of the dataset: turbine_capacity, turbine_hub_height, turbine_rotor_diameter, turbine_rotor_swept_area, turbine_tower_total_height
-print(dataset[['turbine_capacity', 'turbine_hub_height', 'turbine_rotor_diameter', 'turbine_rotor_swept_area', 'turbine_tower_total_height']].describe())
-#counting the number of negative values in each of the above columns
-print((dataset[['turbine_capacity', 'turbine_hub_height', 'turbine_rotor_diameter', 'turbine_rotor_swept_area', 'turbine_tower_total_height']] < 0).sum())
-#counting the number of zero values in each of the above columns
-print((dataset[['turbine_capacity', 'turbine_hub_height', 'turbine_rotor_diameter', 'turbine_rotor_swept_area', 'turbine_tower_total_height']] == 0).sum())
-#counting the unique number of negative values in each of the above columns
-print((dataset[['turbine_capacity', 'turbine_hub_height', 'turbine_rotor_diameter', 'turbine_rotor_swept_area', 'turbine_tower_total_height']] < 0).nunique())
-
-#Changing 'missing' turbine_manufacturer values to 'Unknown'
-dataset['turbine_manufacturer'] = dataset['turbine_manufacturer'].replace('missing', 'Unknown')
-#Changing 'missing' turbine_model values to 'Unknown'
-dataset['turbine_model'] = dataset['turbine_model'].replace('missing', 'Unknown')
-
-##Handling special cases of MISSING YEAR values based off of other information in dataset, note that excel filtering was used to identify these special cases before dropping NaN values
-#Converting the project_year column values of -9999 to NaN
-dataset['project_year'] = dataset['project_year'].replace(-9999, np.nan)
-
-##The first special case deals with the Westinghouse turbine manufacturer with a turbine capacity of 600
-#Filling in NaN project_year values where turbine capacity = 600 by calculating the average project year for all projects with turbine capacity = 600 rounded to the nearest year
-dataset['project_year'] = dataset['project_year'].fillna(round(dataset[dataset['turbine_capacity'] == 600]['project_year'].mean()))
-
-##The second special case deals with multiple cases of Siemens Gamesa Renewable Energy turbine manufacturer whose location is on Scioto Ridg, there are reported missing year values, however when crossexamined by filtering only for the company it becomes apparent these values should have a year value of 2020.
-#Filling in NaN project_year values where turbine manufacturer = Siemens Gamesa Renewable Energy and project name contains Scioto Ridg by replacing them with 2020
-dataset.loc[(dataset['turbine_manufacturer'] == 'Siemens Gamesa Renewable Energy') & (dataset['project_name'].str.contains('Scioto Ridg')), 'project_year'] = 2020
-
-##The third special case of missing year values deals with Senivon USA Corp that has a turbine capacity of 3200, same logic that was used in the Westinghouse special case was used here
-#Filling in NaN project_year values where turbine capacity = 3200 by calculating the average project year for all projects with turbine capacity = 3200 rounded to the nearest year
-dataset['project_year'] = dataset['project_year'].fillna(round(dataset[dataset['turbine_capacity'] == 3200]['project_year'].mean()))
-
-##The fourth special case of missing year values deals with the turbine manufacturer Northern Power Systems with a turbine capacity of 100
-#Filling in NaN project_year values where turbine capacity = 100 by calculating the average project year for all projects with turbine capacity = 100 rounded to the nearest year
-dataset['project_year'] = dataset['project_year'].fillna(round(dataset[dataset['turbine_capacity'] == 100]['project_year'].mean()))
-
-##The final special case of missing year values deals with the turbine manufacturer Seaforth with a turbine capacity of 60.
-#Filling in NaN project_year values where turbine capacity = 60 by calculating the average project year for all projects with turbine capacity = 60 rounded to the nearest year
-dataset['project_year'] = dataset['project_year'].fillna(round(dataset[dataset['turbine_capacity'] == 60]['project_year'].mean()))
-
-##Dropping all observations that have NaN values in the project_year column
-dataset = dataset.dropna(subset=['project_year'])
-
-#printing out the number of NaN values in the project_year column
-print(dataset['project_year'].isnull().sum())
-
-##Now that all NaN values in the project_year column have been handled, we can now impute the averages for the other numerical columns dealing with the turbine dimensions by grouping by project_year and imputing the mean values for each column
-
-#Addressing missing turbine_capacity values of -9999 by replacing them with the mean turbine_capacity value for that specific project year
-dataset['turbine_capacity'] = dataset['turbine_capacity'].replace(-9999, np.nan)
-dataset['turbine_capacity'] = dataset.groupby('project_year')['turbine_capacity'].transform(lambda x: x.fillna(x.mean()))
-#print(dataset['turbine_capacity'].isnull().sum())
-
-#printing years with null values
-print(dataset[dataset['turbine_capacity'].isnull()]['project_year'].unique())
-
-##Addressing years that do not have reported turbine capacity values by imputing the mean turbine capacity of the following year seeing as 1981 and 1989 are the only years with NaN values.
-#Filling in NaN turbine_capacity values of project_year = 1981 by calculating the average turbine_capacity for all projects with project_year = 1982
-dataset.loc[(dataset['project_year'] == 1981), 'turbine_capacity'] = round(dataset[dataset['project_year'] == 1982]['turbine_capacity'].mean())
-#Filling in NaN turbine_capacity values of project_year = 1989 by calculating the average turbine_capacity for all projects with project_year = 1990
-dataset.loc[(dataset['project_year'] == 1989), 'turbine_capacity'] = round(dataset[dataset['project_year'] == 1990]['turbine_capacity'].mean())
-
-#checking to see if there are any more NaN values in the turbine_capacity column
-print(dataset['turbine_capacity'].isnull().sum())
-#converting project_year to integer
-dataset['project_year'] = dataset['project_year'].astype(int)
-
-
-##Addressing missing turbine_hub_height values of -9999 by replacing them with the mean turbine_hub_height value for that specific project year
-dataset['turbine_hub_height'] = dataset['turbine_hub_height'].replace(-9999, np.nan)
-dataset['turbine_hub_height'] = dataset.groupby('project_year')['turbine_hub_height'].transform(lambda x: x.fillna(x.mean()))
-print(dataset['turbine_hub_height'].isnull().sum())
-print(dataset[dataset['turbine_hub_height'].isnull()]['project_year'].unique())
-#dealing with 1981 and 1982 missing turbine_hub_height values by imputing mean turbine_hub_height of 1983
-dataset.loc[(dataset['project_year'] == 1981), 'turbine_hub_height'] = round(dataset[dataset['project_year'] == 1983]['turbine_hub_height'].mean())
-dataset.loc[(dataset['project_year'] == 1982), 'turbine_hub_height'] = round(dataset[dataset['project_year'] == 1983]['turbine_hub_height'].mean())
-#dealing with 1987 missing turbine_hub_height values by imputing mean turbine_hub_height of 1988
-dataset.loc[(dataset['project_year'] == 1987), 'turbine_hub_height'] = round(dataset[dataset['project_year'] == 1988]['turbine_hub_height'].mean())
-#dealing with 1989 and 1991 missing turbine_hub_height values by imputing mean turbine_hub_height of 1990
-dataset.loc[(dataset['project_year'] == 1989), 'turbine_hub_height'] = round(dataset[dataset['project_year'] == 1990]['turbine_hub_height'].mean())
-dataset.loc[(dataset['project_year'] == 1991), 'turbine_hub_height'] = round(dataset[dataset['project_year'] == 1990]['turbine_hub_height'].mean())
-print(dataset['turbine_hub_height'].isnull().sum())
-
-##Addressing missing turbine_rotor_diameter values of -9999 by replacing them with the mean turbine_rotor_diameter value for that specific project year
-dataset['turbine_rotor_diameter'] = dataset['turbine_rotor_diameter'].replace(-9999, np.nan)
-dataset['turbine_rotor_diameter'] = dataset.groupby('project_year')['turbine_rotor_diameter'].transform(lambda x: x.fillna(x.mean()))
-print(dataset['turbine_rotor_diameter'].isnull().sum())
-print(dataset[dataset['turbine_rotor_diameter'].isnull()]['project_year'].unique())
-#dealing with 1981 and 1982 missing turbine_rotor_diameter values by imputing mean turbine_rotor_diameter of 1983
-dataset.loc[(dataset['project_year'] == 1981), 'turbine_rotor_diameter'] = round(dataset[dataset['project_year'] == 1983]['turbine_rotor_diameter'].mean())
-dataset.loc[(dataset['project_year'] == 1982), 'turbine_rotor_diameter'] = round(dataset[dataset['project_year'] == 1983]['turbine_rotor_diameter'].mean())
-#dealing with 1987 missing turbine_rotor_diameter values by imputing mean turbine_rotor_diameter of 1988
-dataset.loc[(dataset['project_year'] == 1987), 'turbine_rotor_diameter'] = round(dataset[dataset['project_year'] == 1988]['turbine_rotor_diameter'].mean())
-#dealing with 1989 missing turbine_rotor_diameter values by imputing mean turbine_rotor_diameter of 1990
-dataset.loc[(dataset['project_year'] == 1989), 'turbine_rotor_diameter'] = round(dataset[dataset['project_year'] == 1990]['turbine_rotor_diameter'].mean())
-print(dataset['turbine_rotor_diameter'].isnull().sum())
-
-##Addressing missing turbine_rotor_swept_area values of -9999 by replacing them with the mean turbine_rotor_swept_area value for that specific project year
-dataset['turbine_rotor_swept_area'] = dataset['turbine_rotor_swept_area'].replace(-9999, np.nan)
-dataset['turbine_rotor_swept_area'] = dataset.groupby('project_year')['turbine_rotor_swept_area'].transform(lambda x: x.fillna(x.mean()))
-print(dataset['turbine_rotor_swept_area'].isnull().sum())
-print(dataset[dataset['turbine_rotor_swept_area'].isnull()]['project_year'].unique())
-#dealing with 1981 and 1982 missing turbine_rotor_swept_area values by imputing mean turbine_rotor_swept_area of 1983
-dataset.loc[(dataset['project_year'] == 1981), 'turbine_rotor_swept_area'] = round(dataset[dataset['project_year'] == 1983]['turbine_rotor_swept_area'].mean())
-dataset.loc[(dataset['project_year'] == 1982), 'turbine_rotor_swept_area'] = round(dataset[dataset['project_year'] == 1983]['turbine_rotor_swept_area'].mean())
-#dealing with 1987 missing turbine_rotor_swept_area values by imputing mean turbine_rotor_swept_area of 1988
-dataset.loc[(dataset['project_year'] == 1987), 'turbine_rotor_swept_area'] = round(dataset[dataset['project_year'] == 1988]['turbine_rotor_swept_area'].mean())
-#dealing with 1989 missing turbine_rotor_swept_area values by imputing mean turbine_rotor_swept_area of 1990
-dataset.loc[(dataset['project_year'] == 1989), 'turbine_rotor_swept_area'] = round(dataset[dataset['project_year'] == 1990]['turbine_rotor_swept_area'].mean())
-print(dataset['turbine_rotor_swept_area'].isnull().sum())
-
-##Addressing missing turbine_tower_total_height values of -9999 by replacing them with the mean turbine_tower_total_height value for that specific project year
-dataset['turbine_tower_total_height'] = dataset['turbine_tower_total_height'].replace(-9999, np.nan)
-dataset['turbine_tower_total_height'] = dataset.groupby('project_year')['turbine_tower_total_height'].transform(lambda x: x.fillna(x.mean()))
-print(dataset['turbine_tower_total_height'].isnull().sum())
-print(dataset[dataset['turbine_tower_total_height'].isnull()]['project_year'].unique())
-#dealing with 1981 and 1982 missing turbine_tower_total_height values by imputing mean turbine_tower_total_height of 1983
-dataset.loc[(dataset['project_year'] == 1981), 'turbine_tower_total_height'] = round(dataset[dataset['project_year'] == 1983]['turbine_tower_total_height'].mean())
-dataset.loc[(dataset['project_year'] == 1982), 'turbine_tower_total_height'] = round(dataset[dataset['project_year'] == 1983]['turbine_tower_total_height'].mean())
-#dealing with 1987 missing turbine_tower_total_height values by imputing mean turbine_tower_total_height of 1988
-dataset.loc[(dataset['project_year'] == 1987), 'turbine_tower_total_height'] = round(dataset[dataset['project_year'] == 1988]['turbine_tower_total_height'].mean())
-#dealing with 1989 missing turbine_tower_total_height values by imputing mean turbine_tower_total_height of 1990
-dataset.loc[(dataset['project_year'] == 1989), 'turbine_tower_total_height'] = round(dataset[dataset['project_year'] == 1990]['turbine_tower_total_height'].mean())
-#dealing with 1991 missing turbine_tower_total_height values by imputing mean turbine_tower_total_height of 1992
-dataset.loc[(dataset['project_year'] == 1991), 'turbine_tower_total_height'] = round(dataset[dataset['project_year'] == 1992]['turbine_tower_total_height'].mean())
-print(dataset['turbine_tower_total_height'].isnull().sum())
-
-##Addressing 'missing' faa_ors values with 'Unknown'
-dataset['faa_ors'] = dataset['faa_ors'].replace('missing', 'Unknown')
-##Addressing 'missing' faa_asn values with 'Unknown'
-dataset['faa_asn'] = dataset['faa_asn'].replace('missing', 'Unknown')
-##Addressing 'missing' usgs_pr_id values with NaN
-dataset['usgs_pr_id'] = dataset['usgs_pr_id'].replace('missing', np.nan)
-##Addressing 'missing' eia_id values with NaN
-dataset['eia_id'] = dataset['eia_id'].replace('missing', np.nan)
-
-##Addressing unknown project name values with 'Unknown' if the first 7 characters of the project name are 'unknown'
-dataset.loc[(dataset['project_name'].str[:7] == 'unknown'), 'project_name'] = 'Unknown'
+#Function that reads the raw United States Wind Turbine Database csv, diagnostics=True prints its first rows, column info, shape and null counts
+def load_raw_dataset(path=DEFAULT_DATA_PATH, diagnostics=False):
+    with stage('load.read_csv') as record:
+        raw_dataset = pd.read_csv(path, low_memory=False)
+        record['rows'] = len(raw_dataset)
+    if diagnostics:
+        print(raw_dataset.head())
+        print(raw_dataset.info())
+        print(raw_dataset.shape)
+
+        ###Checking for missing values
+        print(raw_dataset.isnull().sum())
+    return raw_dataset
+
+#Function that cleans a raw release and returns the compact cleaned dataset
+#Incremental refresh mode: when a previous release of the same source (see turbine_snapshot.source_name) was cleaned with the same rules, a new release is applied as a delta and only the added and changed turbines are cleaned
+#Without a source_name, or with incremental_refresh=False, the whole release is cleaned and no refresh state is kept
+def clean(raw_dataset, incremental_refresh=True, diagnostics=False, source_name=None):
+    if not incremental_refresh or source_name is None:
+        dataset = clean_dataset(raw_dataset, diagnostics).reset_index(drop=True)
+    else:
+        refresh_rules = (turbine_cleaning, turbine_imputation, turbine_refresh)
+        refresh_state = turbine_refresh.load_refresh_state(source_name, *refresh_rules)
+        if refresh_state is None:
+            refresh_state = turbine_refresh.build_refresh_state(raw_dataset, clean_dataset(raw_dataset, diagnostics))
+        else:
+            with stage('clean.refresh', len(raw_dataset)):
+                refresh_state, refresh_summary = turbine_refresh.refresh_dataset(refresh_state, raw_dataset)
+            if diagnostics:
+                #printing the number of added, changed and removed turbines and the number of imputed values that were re-filled
+                print(refresh_summary)
+        turbine_refresh.save_refresh_state(refresh_state, source_name, *refresh_rules)
+        dataset = refresh_state['dataset']
+
+    ##Compact storage: low-cardinality text columns become categoricals and numerical columns are downcast
+    with stage('clean.compact', len(dataset)):
+        cleaned_dataset = turbine_compact.compact_dataset(dataset)
+    if diagnostics:
+        #printing the memory of every column before and after
+        print(turbine_compact.memory_report(dataset, cleaned_dataset))
+    return cleaned_dataset
+
+#Function that returns the cleaned dataset of a csv and sets it as the dataset of the analysis functions
+##The cleaned dataset is cached as a columnar snapshot keyed by a hash of the csv and of the cleaning rules, so the csv is only parsed and cleaned again when one of them changes
+#columns limits the dataset to some of its columns, only those are read from the snapshot
+#By default the snapshot is copied out of the file, so the dataset can be changed in place the same way whether it came from the snapshot or from the csv
+#writable=False hands the columns over straight from the memory mapped snapshot without copying them, with copy-on-write a change to the returned frame copies the changed column first
+def load_dataset(path=DEFAULT_DATA_PATH, incremental_refresh=True, diagnostics=False, columns=None, writable=True):
+    key = turbine_snapshot.snapshot_key(path, turbine_cleaning, turbine_imputation, turbine_refresh, turbine_compact)
+    with stage('load.snapshot') as record:
+        cleaned_dataset = turbine_snapshot.load_snapshot(key, columns, writable)
+        record['rows'] = None if cleaned_dataset is None else len(cleaned_dataset)
+    if cleaned_dataset is None:
+        cleaned_dataset = clean(load_raw_dataset(path, diagnostics), incremental_refresh, diagnostics, turbine_snapshot.source_name(path))
+        ##Saving the compact cleaned dataset as a snapshot so later runs can skip the csv parsing and cleaning
+        with stage('load.save_snapshot', len(cleaned_dataset)):
+            turbine_snapshot.save_snapshot(cleaned_dataset, key)
+        if columns is not None:
+            cleaned_dataset = cleaned_dataset[list(columns)]
+    else:
+        #snapshots are stored compact already, this only switches the categorical columns to the dictionaries shared with the other datasets of the process
+        with stage('load.share_dictionaries', len(cleaned_dataset)):
+            cleaned_dataset = turbine_compact.share_dictionaries(cleaned_dataset)
+    if diagnostics and 'turbine_state' in cleaned_dataset:
+        #Counting the number of unique values in the turbine_state column
+        print(cleaned_dataset['turbine_state'].nunique())
+        print(cleaned_dataset['turbine_state'].unique())
+    return set_dataset(cleaned_dataset, key)
+
+#Function that sets the dataset of the analysis functions, its spatial index and aggregate cube are loaded or built by the first query that needs them
+##The graph functions are served from the aggregate cube of turbine counts, column sums and distinct projects over year x state x manufacturer instead of scanning the whole dataset
+#set_dataset has to be called again whenever the dataset changes, which also clears the memoized queries, key saves the spatial index next to the snapshot of the dataset
+#spatial_index can hand over an index already built for the dataset, e.g. to the render workers
+#The frame that is set and the frames returned by load_dataset, set_dataset and get_dataset are detached copies, so changing one of them never leaves the cube, the spatial index or the memoized queries stale
+def set_dataset(new_dataset, key=None, spatial_index=None):
+    global dataset, dataset_key
+    dataset = _detached(new_dataset)
+    dataset_key = key
+    turbine_spatial.set_spatial_dataset(dataset, key, spatial_index)
+    turbine_cube.set_cube_dataset(dataset)
+    return _detached(dataset)
+
+#Function that returns a copy of a dataframe that can be changed without changing the original
+#With copy-on-write the copy shares the data of the original until one of them is written to, so it costs no memory
+def _detached(frame):
+    return frame.copy(deep=not _COPY_ON_WRITE)
+
+#Function that returns the dataset the analysis functions work on, raising an error when none has been loaded yet
+def _current_dataset():
+    if dataset is None:
+        raise RuntimeError('No dataset has been loaded, call load_dataset() or set_dataset(dataset) first')
+    return dataset
+
+#Function that returns a copy of the dataset of the analysis functions, raising an error when none has been loaded yet
+def get_dataset():
+    return _detached(_current_dataset())
 
 ##Saving the current cleaned dataframe to a csv file with a new name at the same filepath.
-#dataset.to_csv('cleaned_dataset.csv', index=False)
+#load_dataset().to_csv('cleaned_dataset.csv', index=False)
 
-#Counting the number of unique values in the turbine_state column
-print(dataset['turbine_state'].nunique())
-print(dataset['turbine_state'].unique())
+##The graph functions take an optional region to only include the turbines inside it, e.g. region=turbine_spatial.radius_region(-100.4, 32.4, 50) for the turbines within 50 km of a point
+#or region=turbine_spatial.box_region(-104, 40, -95, 44) for a bounding box given as west, south, east, north
+#Every graph function returns the values it plots, and with output='<file>.png' or '<file>.svg' the figure is exported to that file without being shown (matplotlib is only imported by the first graph)
 
 ###Data Analysis
 #Function that creates a column graph of the number of wind turbines in each state
-def turbine_state_graph():
-    turbine_state_count = dataset['turbine_state'].value_counts()
-    turbine_state_count.plot(kind='bar', figsize=(20,10))
-    plt.xlabel('State')
-    plt.ylabel('Number of Wind Turbines')
-    plt.title('Number of Wind Turbines in Each State')
-    plt.show()
-    plt.clf()
+def turbine_state_graph(region=None, output=None):
+    figure, axes = turbine_render.new_figure(output)
+    turbine_state_count = turbine_cube.turbine_counts('turbine_state', region=region).sort_values(ascending=False)
+    turbine_state_count.plot(kind='bar', ax=axes)
+    axes.set_xlabel('State')
+    axes.set_ylabel('Number of Wind Turbines')
+    axes.set_title('Number of Wind Turbines in Each State')
+    turbine_render.finish_figure(figure, output)
+    return turbine_state_count
 #turbine_state_graph()
 
 #Function that creates a column graph of the number of wind turbines given two states as parameters
-def turbine_state_graph_two_states(state1, state2):
-    turbine_state_count = dataset['turbine_state'].value_counts()
+def turbine_state_graph_two_states(state1, state2, region=None, output=None):
+    figure, axes = turbine_render.new_figure(output)
+    turbine_state_count = turbine_cube.turbine_counts('turbine_state', filters={'turbine_state': [state1, state2]}, region=region)
     turbine_state_count = turbine_state_count.loc[[state1, state2]]
-    turbine_state_count.plot(kind='bar', figsize=(20,10))
-    plt.xlabel('State')
-    plt.ylabel('Number of Wind Turbines')
-    plt.title('Number of Wind Turbines in Each State')
-    plt.show()
-    plt.clf()
+    turbine_state_count.plot(kind='bar', ax=axes)
+    axes.set_xlabel('State')
+    axes.set_ylabel('Number of Wind Turbines')
+    axes.set_title('Number of Wind Turbines in Each State')
+    turbine_render.finish_figure(figure, output)
+    return turbine_state_count
 #turbine_state_graph_two_states('CA', 'TX')
 
 #Function that creates a column graph of the number of unique project names in each state ordered by descending number of unique project names
-def unique_project_name_graph_by_state():
-    unique_project_name_count = dataset.groupby('turbine_state')['project_name'].nunique().sort_values(ascending=False)
-    unique_project_name_count.plot(kind='bar', figsize=(20,10))
-    plt.xlabel('State')
-    plt.ylabel('Number of Unique Project Names')
-    plt.title('Number of Unique Project Names in Each State')
-    plt.show()
-    plt.clf()
+def unique_project_name_graph_by_state(region=None, output=None):
+    figure, axes = turbine_render.new_figure(output)
+    unique_project_name_count = turbine_cube.distinct_projects('turbine_state', region=region).sort_values(ascending=False)
+    unique_project_name_count.plot(kind='bar', ax=axes)
+    axes.set_xlabel('State')
+    axes.set_ylabel('Number of Unique Project Names')
+    axes.set_title('Number of Unique Project Names in Each State')
+    turbine_render.finish_figure(figure, output)
+    return unique_project_name_count
 #unique_project_name_graph_by_state()
 
 #Function that creates a pie chart of the number of wind turbines in each state, with the bottom 20% being grouped into 'Other'
-def turbine_state_pie_chart():
-    turbine_state_count = dataset['turbine_state'].value_counts()
+def turbine_state_pie_chart(region=None, output=None):
+    figure, axes = turbine_render.new_figure(output)
+    turbine_state_count = turbine_cube.turbine_counts('turbine_state', region=region).sort_values(ascending=False)
     turbine_state_count_other = turbine_state_count.iloc[12:].sum()
     turbine_state_count = turbine_state_count.iloc[:12]
     turbine_state_count['Other'] = turbine_state_count_other
-    turbine_state_count.plot(kind='pie', figsize=(20,10), autopct='%1.1f%%', startangle=90)
-    plt.title('Percentage of Wind Turbines in Each State')
-    plt.show()
-    plt.clf()
+    turbine_state_count.plot(kind='pie', ax=axes, autopct='%1.1f%%', startangle=90)
+    axes.set_title('Percentage of Wind Turbines in Each State')
+    turbine_render.finish_figure(figure, output)
+    return turbine_state_count
 #turbine_state_pie_chart()
 
 #Function that creates a scatterplot of two different column names as x and y values
-def scatterplot(x, y):
-    plt.scatter(dataset[x], dataset[y])
+#Above turbine_render.DENSITY_POINT_LIMIT points the turbines are binned in NumPy and drawn as a density instead, density can also be set to 'points', 'hexbin' or 'hist2d'
+#Returns the plotted points, or the centers and turbine counts of the non-empty bins of a density
+def scatterplot(x, y, region=None, output=None, density=None, bins=turbine_render.DENSITY_BINS):
+    figure, axes = turbine_render.new_figure(output)
+    points = _current_dataset() if region is None else _current_dataset().take(turbine_spatial.region_rows(region))
+    points = points[[x, y]]
+    if density is None:
+        density = 'hexbin' if len(points) > turbine_render.DENSITY_POINT_LIMIT else 'points'
+    if density == 'points':
+        axes.scatter(points[x], points[y])
+    else:
+        points = turbine_render.density_plot(axes, points[x], points[y], density, bins).rename(columns={'x': x, 'y': y})
     #making the x-axis look nicer by removing '_' and capitalizing the first letter of each word
     x = x.replace('_', ' ').title()
-    plt.xlabel(x)
+    axes.set_xlabel(x)
     #making the y-axis look nicer by removing '_' and capitalizing the first letter of each word
     y = y.replace('_', ' ').title()
-    plt.ylabel(y)
-    plt.title(f'{x} vs {y}')
-    plt.show()
-    plt.clf()
+    axes.set_ylabel(y)
+    axes.set_title(f'{x} vs {y}')
+    turbine_render.finish_figure(figure, output)
+    return points
 #scatterplot('turbine_hub_height', 'turbine_rotor_diameter')
 
 #Function that creates a line graph of the number of wind turbines produced each year given three states as parameters over time
-def turbine_count_by_year_graph(state1, state2, state3):
-    turbine_count_by_year = dataset.groupby(['project_year', 'turbine_state'])['turbine_state'].count()
-    turbine_count_by_year = turbine_count_by_year.loc[:, [state1, state2, state3]]
-    turbine_count_by_year = turbine_count_by_year.unstack()
-    turbine_count_by_year.plot(kind='line', figsize=(20,10), marker='o')
-    plt.xlabel('Year')
-    plt.ylabel('Number of Wind Turbines')
-    plt.title('Number of Wind Turbines Produced Each Year')
-    plt.show()
-    plt.clf()
+def turbine_count_by_year_graph(state1, state2, state3, region=None, output=None):
+    figure, axes = turbine_render.new_figure(output)
+    turbine_count_by_year = turbine_cube.turbine_counts(['project_year', 'turbine_state'], filters={'turbine_state': [state1, state2, state3]}, region=region)
+    turbine_count_by_year = turbine_count_by_year.unstack()[[state1, state2, state3]]
+    turbine_count_by_year.plot(kind='line', ax=axes, marker='o')
+    axes.set_xlabel('Year')
+    axes.set_ylabel('Number of Wind Turbines')
+    axes.set_title('Number of Wind Turbines Produced Each Year')
+    turbine_render.finish_figure(figure, output)
+    return turbine_count_by_year
 #turbine_count_by_year_graph('CA', 'TX', 'IA')
 
 #Function that creates a line graph showing how an average column value changes over time given a column name as a parameter
-def average_column_value_by_year_graph(column_name):
-    average_column_value_by_year = dataset.groupby('project_year')[column_name].mean()
-    average_column_value_by_year.plot(kind='line', figsize=(20,10), marker='o')
-    plt.xlabel('Year')
-    plt.ylabel(column_name.replace('_', ' ').title())
-    plt.title(f'Average {column_name.replace("_", " ").title()} Over Time')
-    plt.show()
-    plt.clf()
+def average_column_value_by_year_graph(column_name, region=None, output=None):
+    figure, axes = turbine_render.new_figure(output)
+    average_column_value_by_year = turbine_cube.column_mean(column_name, 'project_year', region=region)
+    average_column_value_by_year.plot(kind='line', ax=axes, marker='o')
+    axes.set_xlabel('Year')
+    axes.set_ylabel(column_name.replace('_', ' ').title())
+    axes.set_title(f'Average {column_name.replace("_", " ").title()} Over Time')
+    turbine_render.finish_figure(figure, output)
+    return average_column_value_by_year
 #average_column_value_by_year_graph('turbine_hub_height')
 
-#Function that calculates the correlation coefficient between two columns given two column names as parameters and describes the correlation between the two columns as weak, moderate, or strong
+
+###Batch rendering
+##Batches of graphs are exported in parallel on a process pool, every worker gets the dataset once and renders its share of the figures headless
+#When a job is limited to a region, the spatial index is loaded or built once in this process and handed to the workers with the dataset
+
+#Function that sets the dataset and its spatial index in a render worker process
+def _start_render_worker(worker_dataset, key, spatial_index):
+    set_dataset(worker_dataset, key, spatial_index)
+
+#Function that exports one graph in a render worker process, returning the file it was written to
+def _render_graph(graph, args, kwargs, output):
+    globals()[graph](*args, output=output, **kwargs)
+    return output
+
+#Function that exports a batch of graphs in parallel on n_jobs processes (all cores by default), every job is a (graph function name, arguments, keyword arguments, output file) tuple
+#Returns the files written, in the order of the jobs
+def render_graphs(jobs, n_jobs=None):
+    jobs = list(jobs)
+    spatial_index = turbine_spatial.get_spatial_index() if any(kwargs.get('region') is not None for _, _, kwargs, _ in jobs) else None
+    return turbine_render.render_batch(_render_graph, jobs, _start_render_worker, (_current_dataset(), dataset_key, spatial_index), n_jobs)
+#render_graphs([('turbine_state_graph', (), {}, 'figures/states.png'), ('scatterplot', ('xlong', 'ylat'), {'density': 'hist2d'}, 'figures/locations.svg')])
+
+#Function that returns the render jobs of the average by year graph of every given numerical column (the dimension columns and the project capacity by default)
+def _average_column_value_by_year_jobs(directory, columns=None, format='png', region=None):
+    columns = AVERAGE_BY_YEAR_COLUMNS if columns is None else columns
+    return [('average_column_value_by_year_graph', (column,), {'region': region}, os.path.join(directory, f'average_{column}_by_year.{format}')) for column in columns]
+
+#Function that returns the render jobs of the turbine count by year graph of every triple of the given states (all states by default)
+def _turbine_count_by_year_jobs(directory, states=None, format='png', region=None):
+    states = sorted(_current_dataset()['turbine_state'].dropna().unique()) if states is None else states
+    return [('turbine_count_by_year_graph', triple, {'region': region}, os.path.join(directory, f'turbine_count_by_year_{"_".join(triple)}.{format}'))
+            for triple in combinations(states, 3)]
+
+#Function that exports the average by year graph of every given numerical column (the dimension columns and the project capacity by default) to a directory
+def render_average_column_value_by_year_graphs(directory, columns=None, format='png', region=None, n_jobs=None):
+    return render_graphs(_average_column_value_by_year_jobs(directory, columns, format, region), n_jobs)
+#render_average_column_value_by_year_graphs('figures')
+
+#Function that exports the turbine count by year graph of every triple of the given states (all states by default) to a directory
+def render_turbine_count_by_year_graphs(directory, states=None, format='png', region=None, n_jobs=None):
+    return render_graphs(_turbine_count_by_year_jobs(directory, states, format, region), n_jobs)
+#render_turbine_count_by_year_graphs('figures', ['CA', 'TX', 'IA', 'OK', 'KS'])
+
+#Function that calculates the correlation coefficient between two columns given two column names as parameters, returning it rounded to 3 decimals with its description as weak, moderate, or strong
 def correlation_coefficient(column1, column2):
-    correlation_coefficient = round(dataset[column1].corr(dataset[column2]), 3)
-    if correlation_coefficient >= 0.7 or correlation_coefficient <= -0.7:
-        print(f'The correlation between {column1.replace("_", " ").title()} and {column2.replace("_", " ").title()} is strong.')
-    elif correlation_coefficient >= 0.3 or correlation_coefficient <= -0.3:
-        print(f'The correlation between {column1.replace("_", " ").title()} and {column2.replace("_", " ").title()} is moderate.')
-    else:
-        print(f'The correlation between {column1.replace("_", " ").title()} and {column2.replace("_", " ").title()} is weak.')
-    print(f'The correlation coefficient is {correlation_coefficient}')
+    with stage('analysis.correlation_coefficient', len(_current_dataset())):
+        correlation_coefficient = round(_current_dataset()[column1].corr(_current_dataset()[column2]), 3)
+    return correlation_coefficient, correlation_strength(correlation_coefficient)
 #correlation_coefficient('turbine_hub_height', 'turbine_rotor_diameter')
 
+#To screen many pairs at once, correlation_matrix returns the Pearson or Spearman coefficient and strength of every pair of columns in one pass, optionally per group and with bootstrap confidence intervals
+#correlation_matrix(get_dataset(), turbine_imputation.DIMENSION_COLUMNS, method='spearman', group_by='turbine_state', bootstrap=1000)
+
 #Function that calculates the chi2 statistic and p-value between two categorical columns given two column names as parameters and tell us whether or not the two columns are independent of each other (null hypothesis is that the two columns are independent of each other)
+#Returns the chi2 statistic, p-value, degrees of freedom, Cramer's V and whether the null hypothesis is rejected
 def chi2_test(column1, column2):
-    chi2_statistic, p_value, dof, expected = chi2_contingency(pd.crosstab(dataset[column1], dataset[column2]))
-    print(f'Chi2 Statistic: {chi2_statistic}')
-    print(f'P-Value: {p_value}')
-    print(f'Degrees of Freedom: {dof}')
-    #print(f'Expected: {expected}')
-    if p_value <= 0.05:
+    with stage('analysis.chi2_test', len(_current_dataset())):
+        return association_table(_current_dataset(), pairs=[(column1, column2)]).iloc[0]
+#chi2_test('turbine_manufacturer', 'turbine_state')
+
+#To screen many categorical pairs at once, association_table encodes every column to integer codes once and returns the chi2 test and Cramer's V of every pair, optionally with permutation p-values
+#association_table(get_dataset(), ['turbine_manufacturer', 'turbine_model', 'turbine_state', 'turbine_county'], permutations=1000)
+
+#Function that returns the summary statistics of the dimension columns
+def summary_statistics():
+    return _current_dataset()[turbine_imputation.DIMENSION_COLUMNS].describe()
+#summary_statistics()
+
+
+###Command line interface
+##python US_wind_turbine_analysis.py <command> runs one analysis as a batch job and prints its result, e.g.
+#python US_wind_turbine_analysis.py correlation turbine_hub_height turbine_rotor_diameter
+#python US_wind_turbine_analysis.py associations turbine_manufacturer turbine_model turbine_state --output associations.csv
+#python US_wind_turbine_analysis.py render figures --format svg --states CA TX IA OK KS --scatter turbine_hub_height turbine_rotor_diameter
+#Tables are printed, or written to a csv with --output
+#--profile report.json records the wall time, peak memory and rows of every pipeline stage the command runs into a JSON report
+
+#Function that prints a result table or writes it to a csv file
+def _write_table(table, output, index=False):
+    if output is None:
+        print(table.to_string(index=index))
+    else:
+        table.to_csv(output, index=index)
+
+#Function that cleans the dataset, refreshing the snapshot, and optionally writes the cleaned dataset to a csv file
+def _clean_command(arguments):
+    cleaned_dataset = _current_dataset()
+    if arguments.output is not None:
+        cleaned_dataset.to_csv(arguments.output, index=False)
+    print(f'{len(cleaned_dataset)} turbines cleaned')
+
+#Function that prints the summary statistics of the dimension columns
+def _summary_command(arguments):
+    _write_table(summary_statistics(), arguments.output, index=True)
+
+#Function that prints the correlation between two columns and its description
+def _correlation_command(arguments):
+    column1, column2 = arguments.column1, arguments.column2
+    coefficient, strength = correlation_coefficient(column1, column2)
+    print(f'The correlation between {column1.replace("_", " ").title()} and {column2.replace("_", " ").title()} is {strength}.')
+    print(f'The correlation coefficient is {coefficient}')
+
+#Function that prints the correlation of every pair of the given columns
+def _correlation_matrix_command(arguments):
+    _write_table(correlation_matrix(_current_dataset(), arguments.columns or turbine_imputation.DIMENSION_COLUMNS, arguments.method, arguments.group_by,
+                                    arguments.bootstrap, seed=arguments.seed, n_jobs=arguments.jobs), arguments.output)
+
+#Function that prints the chi2 test of two categorical columns and whether they are independent
+def _chi2_command(arguments):
+    column1, column2 = arguments.column1, arguments.column2
+    result = chi2_test(column1, column2)
+    print(f'Chi2 Statistic: {result["chi2_statistic"]}')
+    print(f'P-Value: {result["p_value"]}')
+    print(f'Degrees of Freedom: {result["dof"]}')
+    if result['reject_independence']:
         print(f'We reject the null hypothesis that {column1.replace("_", " ").title()} and {column2.replace("_", " ").title()} are independent of each other.')
     else:
         print(f'We fail to reject the null hypothesis that {column1.replace("_", " ").title()} and {column2.replace("_", " ").title()} are independent of each other.')
-#chi2_test('turbine_manufacturer', 'turbine_state')
-
 
-#print(dataset[['turbine_capacity', 'turbine_hub_height', 'turbine_rotor_diameter', 'turbine_rotor_swept_area', 'turbine_tower_total_height']].describe())
\ No newline at end of file
+#Function that prints the chi2 test and Cramer's V of every pair of the given categorical columns
+def _associations_command(arguments):
+    _write_table(association_table(_current_dataset(), arguments.columns, permutations=arguments.permutations, seed=arguments.seed, n_jobs=arguments.jobs), arguments.output)
+
+#Function that exports the state graphs, the average by year graph of every given numerical column, the count by year graph of every triple of the given states and the scatterplot of every given pair of columns
+def _render_command(arguments):
+    directory, format = arguments.directory, arguments.format
+    jobs = [(graph, (), {}, os.path.join(directory, f'{graph}.{format}')) for graph in ['turbine_state_graph', 'unique_project_name_graph_by_state', 'turbine_state_pie_chart']]
+    jobs += _average_column_value_by_year_jobs(directory, arguments.columns or None, format)
+    if arguments.states:
+        jobs += _turbine_count_by_year_jobs(directory, arguments.states, format)
+    for x, y in arguments.scatter or []:
+        jobs.append(('scatterplot', (x, y), {'density': arguments.density}, os.path.join(directory, f'scatterplot_{x}_{y}.{format}')))
+    for output in render_graphs(jobs, arguments.jobs):
+        print(output)
+
+#Function that builds the command line parser
+def build_parser():
+    parser = argparse.ArgumentParser(description='Cleaning and analysis of the United States Wind Turbine Database')
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help='path of the USWTDB csv')
+    parser.add_argument('--diagnostics', action='store_true', help='print the checks and summary statistics of the loading and cleaning stages')
+    parser.add_argument('--full-refresh', action='store_true', help='clean the whole release instead of applying it as a delta to the previous one')
+    parser.add_argument('--profile', metavar='REPORT', help='JSON file to write the wall time, peak memory and rows of every pipeline stage to')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('clean', help='clean the dataset and refresh its snapshot')
+    command.add_argument('--output', help='csv file to write the cleaned dataset to')
+    command.set_defaults(run=_clean_command)
+
+    command = commands.add_parser('summary', help='summary statistics of the dimension columns')
+    command.add_argument('--output', help='csv file to write the table to')
+    command.set_defaults(run=_summary_command)
+
+    command = commands.add_parser('correlation', help='correlation between two columns')
+    command.add_argument('column1')
+    command.add_argument('column2')
+    command.set_defaults(run=_correlation_command)
+
+    command = commands.add_parser('correlation-matrix', help='correlation of every pair of columns (the dimension columns by default)')
+    command.add_argument('columns', nargs='*')
+    command.add_argument('--method', choices=['pearson', 'spearman'], default='pearson')
+    command.add_argument('--group-by')
+    command.add_argument('--bootstrap', type=int, default=0, help='number of bootstrap resamples for confidence intervals')
+    command.add_argument('--seed', type=int, default=0)
+    command.add_argument('--jobs', type=int, help='number of worker processes (all cores by default)')
+    command.add_argument('--output', help='csv file to write the table to')
+    command.set_defaults(run=_correlation_matrix_command)
+
+    command = commands.add_parser('chi2', help='chi2 independence test of two categorical columns')
+    command.add_argument('column1')
+    command.add_argument('column2')
+    command.set_defaults(run=_chi2_command)
+
+    command = commands.add_parser('associations', help='chi2 test and Cramer\'s V of every pair of categorical columns')
+    command.add_argument('columns', nargs='+')
+    command.add_argument('--permutations', type=int, default=0, help='number of permutations for permutation p-values')
+    command.add_argument('--seed', type=int, default=0)
+    command.add_argument('--jobs', type=int, help='number of worker processes (all cores by default)')
+    command.add_argument('--output', help='csv file to write the table to')
+    command.set_defaults(run=_associations_command)
+
+    command = commands.add_parser('render', help='export the graphs to PNG or SVG files in parallel, without showing them')
+    command.add_argument('directory')
+    command.add_argument('--format', choices=turbine_render.EXPORT_FORMATS, default='png')
+    command.add_argument('--columns', nargs='*', help='numerical columns of the average by year graphs (the dimension columns and project_capacity by default)')
+    command.add_argument('--states', nargs='*', help='states whose every triple gets a turbine count by year graph')
+    command.add_argument('--scatter', nargs=2, action='append', metavar=('X', 'Y'), help='columns of a scatterplot, can be repeated')
+    command.add_argument('--density', choices=['points', 'hexbin', 'hist2d'], help='scatterplot mode (density above %d points by default)' % turbine_render.DENSITY_POINT_LIMIT)
+    command.add_argument('--jobs', type=int, help='number of worker processes (all cores by default)')
+    command.set_defaults(run=_render_command)
+    return parser
+
+#Function that runs the command line interface
+def main(argv=None):
+    arguments = build_parser().parse_args(argv)
+    if arguments.profile is None:
+        load_dataset(arguments.data, incremental_refresh=not arguments.full_refresh, diagnostics=arguments.diagnostics)
+        arguments.run(arguments)
+        return 0
+    with turbine_profiling.profile_stages() as records:
+        with stage(f'command.{arguments.command}'):
+            load_dataset(arguments.data, incremental_refresh=not arguments.full_refresh, diagnostics=arguments.diagnostics)
+            arguments.run(arguments)
+    turbine_profiling.write_report(arguments.profile, command=sys.argv[1:] if argv is None else list(argv), stages=records)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
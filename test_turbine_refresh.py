@@ -0,0 +1,67 @@
+###Importing the libraries
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import turbine_cleaning
+import turbine_imputation
+import turbine_profiling
+import turbine_refresh
+import turbine_snapshot
+import turbine_synthetic
+from US_wind_turbine_analysis import clean
+
+pytest.importorskip('pyarrow')
+
+
+###Refreshing a synthetic release
+##Applying a new release as a delta to the refresh state of the previous one has to give the same dataset as cleaning the whole new release
+
+#Rules the refresh state is kept for, the same ones clean passes
+REFRESH_RULES = (turbine_cleaning, turbine_imputation, turbine_refresh)
+
+#Function that keeps the refresh states of a test in its own temporary directory
+@pytest.fixture(autouse=True)
+def refresh_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(turbine_refresh, 'REFRESH_DIR', str(tmp_path / 'refresh'))
+    return turbine_refresh.REFRESH_DIR
+
+#Function that returns a synthetic release and the next release, in which turbines were removed, changed (including newly missing values) and added
+def releases():
+    previous = turbine_synthetic.generate_dataset(4000, seed=1)
+    generator = np.random.default_rng(2)
+    release = previous.drop(generator.choice(len(previous), 200, replace=False)).reset_index(drop=True)
+    changed = generator.choice(len(release), 300, replace=False)
+    release.loc[changed[:150], 't_hh'] = release.loc[changed[:150], 't_hh'] + 5
+    release.loc[changed[150:250], 't_hh'] = turbine_imputation.MISSING_VALUE
+    release.loc[changed[250:], 'p_year'] = turbine_imputation.MISSING_VALUE
+    #the added turbines get case_ids no turbine of the previous release has
+    added = turbine_synthetic.generate_dataset(400, seed=3, first_case_id=int(previous['case_id'].max()) + 10 ** 7)
+    return previous, pd.concat([release, added], ignore_index=True)
+
+def test_refresh_matches_full_clean():
+    previous, release = releases()
+    clean(previous, source_name='synthetic')
+    with turbine_profiling.profile_stages() as records:
+        refreshed = clean(release, source_name='synthetic')
+    assert 'clean.refresh' in [record['stage'] for record in records]
+    pd.testing.assert_frame_equal(refreshed, clean(release, incremental_refresh=False))
+
+def test_interrupted_save_keeps_previous_state(refresh_dir, monkeypatch):
+    previous, release = releases()
+    clean(previous, source_name='synthetic')
+    write_frame = turbine_snapshot.write_frame
+    #failing the third of the four files of the state
+    calls = []
+    def failing_write_frame(frame, path):
+        calls.append(path)
+        if len(calls) == 3:
+            raise OSError('disk full')
+        return write_frame(frame, path)
+    monkeypatch.setattr(turbine_snapshot, 'write_frame', failing_write_frame)
+    with pytest.raises(OSError):
+        clean(release, source_name='synthetic')
+    monkeypatch.setattr(turbine_snapshot, 'write_frame', write_frame)
+    state = turbine_refresh.load_refresh_state('synthetic', *REFRESH_RULES)
+    assert len(state['dataset']) == len(previous)
+    assert os.listdir(refresh_dir) == [os.path.basename(turbine_refresh.refresh_state_dir('synthetic', *REFRESH_RULES))]
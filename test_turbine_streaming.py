@@ -0,0 +1,47 @@
+###Importing the libraries
+import numpy as np
+import pandas as pd
+import pytest
+import turbine_synthetic
+from turbine_cleaning import clean_dataset
+from turbine_streaming import DEFAULT_MEMORY_LIMIT, clean_csv_streaming
+
+
+###Streaming the cleaning of a synthetic release
+##The streamed output has to hold the same rows and values as cleaning the whole csv in memory
+#Imputed values may only differ in their last bits, because the streaming pass adds up the year sums exactly (see turbine_streaming)
+
+#Function that writes a small synthetic release shared by the tests of this module
+@pytest.fixture(scope='module')
+def source_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('streaming') / 'synthetic.csv')
+    turbine_synthetic.write_dataset(path, 5000, seed=1)
+    return path
+
+#Function that reads the output of the streaming pass back, the text columns of a csv are read as text so identifiers made of digits are not parsed as numbers
+def read_output(path, text_columns):
+    if path.endswith('.arrow'):
+        return pd.read_feather(path)
+    return pd.read_csv(path, dtype={column: str for column in text_columns}, low_memory=False)
+
+#Function that asserts two cleaned datasets hold the same rows, numerical values within a relative difference of 1e-12
+def assert_same_rows(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    assert len(actual) == len(expected)
+    for column in expected.columns:
+        if pd.api.types.is_numeric_dtype(expected[column]):
+            np.testing.assert_allclose(actual[column].to_numpy(float), expected[column].to_numpy(float), rtol=1e-12, atol=0, err_msg=column)
+        else:
+            pd.testing.assert_series_equal(actual[column].astype(expected[column].dtype), expected[column], check_names=False)
+
+#chunk_rows=None sizes the chunks from the memory limit, 1 MiB splits the release into several hundred rows per chunk
+@pytest.mark.parametrize('chunk_rows, memory_limit', [(777, DEFAULT_MEMORY_LIMIT), (None, 1 << 20)])
+@pytest.mark.parametrize('extension', ['.csv', '.arrow'])
+def test_streaming_matches_clean_dataset(source_path, tmp_path, chunk_rows, memory_limit, extension):
+    if extension == '.arrow':
+        pytest.importorskip('pyarrow')
+    output_path = str(tmp_path / f'cleaned{extension}')
+    clean_csv_streaming(source_path, output_path, memory_limit, chunk_rows)
+    expected = clean_dataset(pd.read_csv(source_path, low_memory=False)).reset_index(drop=True)
+    text_columns = expected.select_dtypes(exclude='number').columns
+    assert_same_rows(read_output(output_path, text_columns), expected)
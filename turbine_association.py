@@ -0,0 +1,123 @@
+###Importing the libraries
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import numpy as np
+import pandas as pd
+
+
+###Association settings
+#p-value at or below which the null hypothesis that two columns are independent is rejected
+SIGNIFICANCE_LEVEL = 0.05
+#Largest number of cells a contingency table is counted densely with bincount, larger tables only count their non-empty cells
+DENSE_CELL_LIMIT = 1 << 22
+#Number of permutations computed by one task of the process pool
+PERMUTATION_BATCH_SIZE = 100
+
+
+###Integer coding
+#Function that encodes every categorical column once to integer codes, missing values get the code -1 and are left out of the tables like pd.crosstab does
+def encode_columns(dataset, columns):
+    encoded = {}
+    for column in columns:
+        #categorical columns of a compact dataset already hold their integer codes
+        if isinstance(dataset[column].dtype, pd.CategoricalDtype):
+            encoded[column] = (dataset[column].cat.codes.to_numpy().astype(np.int32), len(dataset[column].cat.categories))
+            continue
+        codes, categories = pd.factorize(dataset[column])
+        encoded[column] = (codes.astype(np.int32), len(categories))
+    return encoded
+
+
+###Chi2 statistic
+#Function that calculates the chi2 statistic, degrees of freedom, number of observations and smaller table dimension of two integer coded columns without building a string keyed crosstab
+#Only the categories that occur together with a value of the other column are counted, and only the non-empty cells are needed since sum((O - E)^2 / E) = N * sum(O^2 / (row total * column total)) - N
+def _chi2_statistic(codes1, size1, codes2, size2, correction=True):
+    valid = (codes1 >= 0) & (codes2 >= 0)
+    codes1 = codes1[valid]
+    codes2 = codes2[valid]
+    observations = len(codes1)
+    row_totals = np.bincount(codes1, minlength=size1)
+    column_totals = np.bincount(codes2, minlength=size2)
+    rows = np.count_nonzero(row_totals)
+    columns = np.count_nonzero(column_totals)
+    dof = (rows - 1) * (columns - 1)
+    dimension = min(rows, columns)
+    if dof == 0:
+        return 0.0, dof, observations, dimension
+    keys = codes1.astype(np.int64) * size2 + codes2
+    if size1 * size2 <= DENSE_CELL_LIMIT:
+        cell_counts = np.bincount(keys, minlength=size1 * size2)
+        cells = np.flatnonzero(cell_counts)
+        cell_counts = cell_counts[cells]
+    else:
+        cells, cell_counts = np.unique(keys, return_counts=True)
+    cell_rows = row_totals[cells // size2].astype(float)
+    cell_columns = column_totals[cells % size2].astype(float)
+    #2x2 tables get the Yates continuity correction like scipy's chi2_contingency, which needs the empty cells as well
+    if correction and dof == 1:
+        table = np.zeros((size1, size2))
+        table[cells // size2, cells % size2] = cell_counts
+        table = table[row_totals > 0][:, column_totals > 0]
+        expected = np.outer(table.sum(axis=1), table.sum(axis=0)) / observations
+        adjustment = np.minimum(np.abs(table - expected), 0.5) * np.sign(expected - table)
+        return float((((table + adjustment) - expected) ** 2 / expected).sum()), dof, observations, dimension
+    statistic = observations * (cell_counts.astype(float) ** 2 / (cell_rows * cell_columns)).sum() - observations
+    return float(max(statistic, 0.0)), dof, observations, dimension
+
+#Function that counts how many random permutations of the second column give a chi2 statistic at least as large as the observed one, run in the worker processes
+def _permutation_batch(codes1, size1, codes2, size2, statistic, permutations, seed):
+    generator = np.random.default_rng(seed)
+    valid = (codes1 >= 0) & (codes2 >= 0)
+    codes1 = codes1[valid]
+    codes2 = codes2[valid]
+    exceeded = 0
+    for _ in range(permutations):
+        permuted_statistic = _chi2_statistic(codes1, size1, generator.permutation(codes2), size2)[0]
+        #allowing for rounding so permutations that reproduce the observed table count as at least as large
+        exceeded += permuted_statistic >= statistic * (1 - 1e-12)
+    return exceeded
+
+
+###Association tables
+#Function that tests many pairs of categorical columns for independence in one call, returning the chi2 statistic, p-value, degrees of freedom and Cramer's V of every pair
+#pairs defaults to every pair of the given columns, permutations adds a permutation-based p-value computed in parallel on n_jobs processes (all cores by default)
+def association_table(dataset, columns=None, pairs=None, permutations=0, seed=0, n_jobs=None):
+    #scipy is only imported on first use so importing this module stays cheap
+    from scipy.stats import chi2
+    if pairs is None:
+        pairs = list(combinations(columns, 2))
+    pairs = [tuple(pair) for pair in pairs]
+    encoded = encode_columns(dataset, sorted({column for pair in pairs for column in pair}))
+    results = []
+    for column1, column2 in pairs:
+        codes1, size1 = encoded[column1]
+        codes2, size2 = encoded[column2]
+        statistic, dof, observations, dimension = _chi2_statistic(codes1, size1, codes2, size2)
+        #Cramer's V uses the statistic without the continuity correction and the smaller of the two table dimensions
+        uncorrected_statistic = _chi2_statistic(codes1, size1, codes2, size2, correction=False)[0] if dof == 1 else statistic
+        cramers_v = np.sqrt(uncorrected_statistic / (observations * (dimension - 1))) if dimension > 1 else np.nan
+        p_value = chi2.sf(statistic, dof) if dof > 0 else 1.0
+        results.append({'column1': column1, 'column2': column2, 'chi2_statistic': statistic, 'p_value': p_value, 'dof': dof,
+                        'cramers_v': cramers_v, 'observations': observations})
+    result = pd.DataFrame(results, columns=['column1', 'column2', 'chi2_statistic', 'p_value', 'dof', 'cramers_v', 'observations'])
+    if permutations:
+        result['permutation_p_value'] = _permutation_p_values(encoded, pairs, result['chi2_statistic'].to_numpy(), permutations, seed, n_jobs)
+    result['reject_independence'] = result['p_value'] <= SIGNIFICANCE_LEVEL
+    return result
+
+#Function that calculates the permutation p-values of every pair, spreading batches of permutations over a process pool
+#Every batch gets its own seed spawned from the given seed in a fixed order, so the p-values do not depend on the number of workers
+def _permutation_p_values(encoded, pairs, statistics, permutations, seed, n_jobs):
+    batches = [(pair, min(PERMUTATION_BATCH_SIZE, permutations - start)) for pair in range(len(pairs)) for start in range(0, permutations, PERMUTATION_BATCH_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    tasks = [(*encoded[pairs[pair][0]], *encoded[pairs[pair][1]], statistics[pair], count, batch_seed) for (pair, count), batch_seed in zip(batches, seeds)]
+    if n_jobs == 1:
+        results = [_permutation_batch(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+            results = list(executor.map(_permutation_batch, *zip(*tasks)))
+    exceeded = np.zeros(len(pairs))
+    for (pair, _), count in zip(batches, results):
+        exceeded[pair] += count
+    return (exceeded + 1) / (permutations + 1)
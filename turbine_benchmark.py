@@ -0,0 +1,232 @@
+###Importing the libraries
+import argparse
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager
+import pandas as pd
+import turbine_compact
+import turbine_cube
+import turbine_profiling
+import turbine_refresh
+import turbine_snapshot
+import turbine_synthetic
+from turbine_association import association_table
+from turbine_cleaning import clean_dataset, rename_columns, replace_missing_labels
+from turbine_correlation import correlation_matrix
+from turbine_imputation import DIMENSION_COLUMNS, impute_by_year, impute_project_year, project_year_statistics, year_statistics
+from turbine_profiling import stage
+
+
+###Benchmark settings
+#Directory of the synthetic datasets and benchmark reports, next to this script
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.benchmarks')
+#Multiples of the real USWTDB row count the benchmarks run at by default
+DEFAULT_SCALES = [1, 10, 100]
+#Number of timed runs of every stage, the fastest one is reported
+DEFAULT_REPEATS = 3
+#A stage regresses when its median wall time or peak memory grows by more than this fraction over the baseline report
+REGRESSION_TOLERANCE = 0.2
+#and by more than these absolute amounts, smaller changes are within the noise of a shared machine
+MINIMUM_WALL_DELTA_SECONDS = 0.05
+MINIMUM_PEAK_MEMORY_DELTA_BYTES = 1 << 20
+#Columns of the correlation and chi2 benchmarks
+CORRELATION_COLUMNS = ('turbine_hub_height', 'turbine_rotor_diameter')
+CHI2_COLUMNS = ('turbine_manufacturer', 'turbine_state')
+ASSOCIATION_COLUMNS = ['turbine_manufacturer', 'turbine_model', 'turbine_state', 'turbine_county']
+
+
+###Synthetic datasets
+#Function that returns the path of the synthetic dataset of a scale and seed, generating it on first use
+def synthetic_dataset_path(scale, seed=0):
+    path = os.path.join(BENCHMARK_DIR, f'synthetic_{scale}x_seed{seed}.csv')
+    if not os.path.exists(path):
+        turbine_synthetic.write_dataset(path, round(scale * turbine_synthetic.USWTDB_ROW_COUNT), seed)
+    return path
+
+#Function that keeps the snapshots (and the refresh states and spatial indexes saved with them) in a directory while the block runs, so the synthetic datasets never fill the snapshot cache of the real one
+@contextmanager
+def snapshot_directory(directory):
+    snapshot_dir, refresh_dir = turbine_snapshot.SNAPSHOT_DIR, turbine_refresh.REFRESH_DIR
+    turbine_snapshot.SNAPSHOT_DIR, turbine_refresh.REFRESH_DIR = directory, os.path.join(directory, 'refresh')
+    try:
+        yield directory
+    finally:
+        turbine_snapshot.SNAPSHOT_DIR, turbine_refresh.REFRESH_DIR = snapshot_dir, refresh_dir
+
+
+###Measuring stages
+##Every stage is run once untimed to warm up (lazy imports, caches), timed through the same stage hooks the pipeline reports to, then run once more with memory allocations traced for its peak memory
+#Tracing slows allocations down, so the traced run is kept apart from the timed ones
+
+#Function that measures a stage: run(*setup()) is timed repeats times after one untimed warm-up run, with setup (e.g. copying a dataset the stage changes in place) left out of the timing
+#Returns the measurement and the output of the last timed run, so it can be the input of the next stage
+def measure(name, run, setup=None, rows=None, repeats=DEFAULT_REPEATS):
+    records = []
+    #only the stage itself is kept, not the stages the pipeline reports from inside it
+    def hook(record):
+        if record['stage'] == name and record['parent'] is None:
+            records.append(record)
+    #warming up before the hook is registered, so the first call (e.g. the one importing scipy) is never timed
+    run(*(setup() if setup is not None else ()))
+    turbine_profiling.add_stage_hook(hook)
+    try:
+        for repeat in range(repeats):
+            inputs = setup() if setup is not None else ()
+            output = None
+            with stage(name, rows):
+                output = run(*inputs)
+            del inputs
+        inputs = setup() if setup is not None else ()
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            with stage(name, rows):
+                run(*inputs)
+        finally:
+            if started:
+                tracemalloc.stop()
+        del inputs
+    finally:
+        turbine_profiling.remove_stage_hook(hook)
+    wall_seconds = sorted(record['wall_seconds'] for record in records[:repeats])
+    result = {'stage': name, 'rows': rows, 'repeats': repeats, 'wall_seconds': wall_seconds[0], 'median_wall_seconds': wall_seconds[len(wall_seconds) // 2],
+              'peak_memory_bytes': records[-1]['peak_memory_bytes']}
+    result['rows_per_second'] = rows / result['wall_seconds'] if rows and result['wall_seconds'] > 0 else None
+    return result, output
+
+#Function that runs every benchmark stage on the synthetic dataset of a scale, feeding the output of every stage to the next one
+#Stages that change their input in place get a fresh copy for every run
+def benchmark_scale(scale, seed=0, repeats=DEFAULT_REPEATS):
+    #imported here so importing this module does not import the analysis module and its dependencies
+    import US_wind_turbine_analysis as analysis
+    path = synthetic_dataset_path(scale, seed)
+    results = []
+
+    ##Loading
+    result, raw_dataset = measure('load.read_csv', lambda: pd.read_csv(path, low_memory=False), repeats=repeats)
+    rows = result['rows'] = len(raw_dataset)
+    result['rows_per_second'] = rows / result['wall_seconds']
+    results.append(result)
+    #the cache-hit path of load_dataset: hashing the csv, reading the snapshot and sharing its dictionaries, the warm-up run cleans the csv and writes the snapshot
+    with snapshot_directory(os.path.join(BENCHMARK_DIR, 'snapshots')):
+        result, _ = measure('load.load_dataset.warm', lambda: analysis.load_dataset(path, incremental_refresh=False), rows=rows, repeats=repeats)
+    results.append(result)
+
+    ##Cleaning, every imputation stage on its own and then the whole chain
+    result, dataset = measure('clean.rename_columns', rename_columns, lambda: (raw_dataset,), rows, repeats)
+    results.append(result)
+    result, dataset = measure('clean.replace_missing_labels', replace_missing_labels, lambda: (dataset.copy(),), rows, repeats)
+    results.append(result)
+    result, statistics = measure('clean.project_year_statistics', project_year_statistics, lambda: (dataset,), rows, repeats)
+    results.append(result)
+    result, dataset = measure('clean.impute_project_year', impute_project_year, lambda: (dataset.copy(), statistics), rows, repeats)
+    results.append(result)
+    result, statistics = measure('clean.year_statistics', year_statistics, lambda: (dataset, DIMENSION_COLUMNS), len(dataset), repeats)
+    results.append(result)
+    result, dataset = measure('clean.impute_by_year', impute_by_year, lambda: (dataset.copy(), DIMENSION_COLUMNS, 'project_year', statistics), len(dataset), repeats)
+    results.append(result)
+    del dataset, statistics
+    result, dataset = measure('clean.clean_dataset', clean_dataset, lambda: (raw_dataset,), rows, repeats)
+    results.append(result)
+    del raw_dataset
+    result, dataset = measure('clean.compact', turbine_compact.compact_dataset, lambda: (dataset,), len(dataset), repeats)
+    results.append(result)
+
+    ##Snapshots
+    snapshot_path = os.path.join(BENCHMARK_DIR, f'snapshot_{scale}x_seed{seed}.arrow')
+    result, written = measure('load.save_snapshot', turbine_snapshot.write_frame, lambda: (dataset, snapshot_path), len(dataset), repeats)
+    if written is not None:
+        results.append(result)
+        result, _ = measure('load.snapshot', turbine_snapshot.read_frame, lambda: (snapshot_path,), len(dataset), repeats)
+        results.append(result)
+        os.remove(snapshot_path)
+
+    ##Aggregation, the cube build and its queries, cold (right after the cube is built) and memoized
+    result, _ = measure('aggregate.build_cube', turbine_cube.build_cube, lambda: (dataset,), len(dataset), repeats)
+    results.append(result)
+    #setting the dataset clears the memoized queries, building the cube is left out of the timing
+    def reset_cube():
+        turbine_cube.set_cube_dataset(dataset)
+        turbine_cube.get_cube()
+        return ()
+    queries = [('turbine_counts', lambda: turbine_cube.turbine_counts(['project_year', 'turbine_state'])),
+               ('column_mean', lambda: turbine_cube.column_mean('turbine_hub_height', 'project_year')),
+               ('distinct_projects', lambda: turbine_cube.distinct_projects('turbine_state'))]
+    for query, run in queries:
+        result, _ = measure(f'aggregate.{query}', run, reset_cube, len(dataset), repeats)
+        results.append(result)
+        result, _ = measure(f'aggregate.{query}.memoized', run, None, len(dataset), repeats)
+        results.append(result)
+
+    ##Analysis
+    analysis.set_dataset(dataset)
+    result, _ = measure('analysis.correlation_coefficient', lambda: analysis.correlation_coefficient(*CORRELATION_COLUMNS), rows=len(dataset), repeats=repeats)
+    results.append(result)
+    result, _ = measure('analysis.chi2_test', lambda: analysis.chi2_test(*CHI2_COLUMNS), rows=len(dataset), repeats=repeats)
+    results.append(result)
+    result, _ = measure('analysis.correlation_matrix', lambda: correlation_matrix(dataset, DIMENSION_COLUMNS), rows=len(dataset), repeats=repeats)
+    results.append(result)
+    result, _ = measure('analysis.association_table', lambda: association_table(dataset, ASSOCIATION_COLUMNS), rows=len(dataset), repeats=repeats)
+    results.append(result)
+    for result in results:
+        result['scale'] = scale
+    return results
+
+#Function that runs the benchmarks at every scale and returns one row per scale and stage, optionally writing them to a JSON report
+def run_benchmarks(scales=DEFAULT_SCALES, seed=0, repeats=DEFAULT_REPEATS, output=None):
+    results = []
+    for scale in scales:
+        results += benchmark_scale(scale, seed, repeats)
+    if output is not None:
+        turbine_profiling.write_report(output, seed=seed, repeats=repeats, scales=list(scales), benchmarks=results)
+    return pd.DataFrame(results, columns=['scale', 'stage', 'rows', 'repeats', 'wall_seconds', 'median_wall_seconds', 'peak_memory_bytes', 'rows_per_second'])
+
+
+###Regressions
+#Function that compares the benchmarks of a report with those of a baseline report, returning one row per scale and stage found in both with the ratios of their median wall time and peak memory
+#A stage regresses when either ratio is above 1 + tolerance and the stage also got slower by more than MINIMUM_WALL_DELTA_SECONDS or grew by more than MINIMUM_PEAK_MEMORY_DELTA_BYTES
+def compare_reports(baseline, current, tolerance=REGRESSION_TOLERANCE):
+    columns = ['scale', 'stage', 'median_wall_seconds', 'peak_memory_bytes']
+    merged = pd.DataFrame(baseline['benchmarks'])[columns].merge(pd.DataFrame(current['benchmarks'])[columns], on=['scale', 'stage'], suffixes=('_baseline', ''))
+    merged['wall_ratio'] = merged['median_wall_seconds'] / merged['median_wall_seconds_baseline']
+    merged['memory_ratio'] = merged['peak_memory_bytes'].astype(float) / merged['peak_memory_bytes_baseline'].astype(float)
+    slower = (merged['wall_ratio'] > 1 + tolerance) & (merged['median_wall_seconds'] - merged['median_wall_seconds_baseline'] > MINIMUM_WALL_DELTA_SECONDS)
+    larger = (merged['memory_ratio'] > 1 + tolerance) & (merged['peak_memory_bytes'] - merged['peak_memory_bytes_baseline'] > MINIMUM_PEAK_MEMORY_DELTA_BYTES)
+    merged['regression'] = slower | larger
+    return merged
+
+
+###Command line interface
+##python turbine_benchmark.py runs the benchmarks at 1x, 10x and 100x the real row count and prints them, e.g.
+#python turbine_benchmark.py --scales 1 10 --output .benchmarks/report.json
+#python turbine_benchmark.py --scales 1 --baseline .benchmarks/report.json
+#With --baseline the exit code is 1 when a stage regressed, so the benchmarks can gate a build
+
+#Function that builds the command line parser
+def build_parser():
+    parser = argparse.ArgumentParser(description='Benchmarks of the cleaning and analysis stages on synthetic USWTDB-shaped datasets')
+    parser.add_argument('--scales', nargs='+', type=float, default=DEFAULT_SCALES, help='multiples of the real USWTDB row count to run at')
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help='number of timed runs of every stage')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the synthetic datasets')
+    parser.add_argument('--output', help='JSON file to write the report to')
+    parser.add_argument('--baseline', help='JSON report to compare the benchmarks against')
+    parser.add_argument('--tolerance', type=float, default=REGRESSION_TOLERANCE, help='fraction a stage may grow by before it counts as a regression')
+    return parser
+
+#Function that runs the command line interface
+def main(argv=None):
+    arguments = build_parser().parse_args(argv)
+    scales = [int(scale) if scale == int(scale) else scale for scale in arguments.scales]
+    results = run_benchmarks(scales, arguments.seed, arguments.repeats, arguments.output)
+    print(results.to_string(index=False))
+    if arguments.baseline is None:
+        return 0
+    comparison = compare_reports(turbine_profiling.read_report(arguments.baseline), {'benchmarks': results.to_dict('records')}, arguments.tolerance)
+    print(comparison.to_string(index=False))
+    return 1 if comparison['regression'].any() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+###Importing the libraries
+import numpy as np
+from turbine_profiling import stage
+from turbine_imputation import DIMENSION_COLUMNS, impute_by_year, impute_project_year, project_year_statistics, year_statistics
+
+
+###Cleaning stages
+#Each stage works on any slice of rows (a whole release, a chunk of the csv or only the changed turbines of a new release), the stages that need statistics of the whole dataset take them as a parameter
+
+#Function that drops the t_img_date column and renames the raw USWTDB columns to the names used throughout the analysis
+def rename_columns(raw_dataset):
+    #drop the t_img_date column
+    dataset = raw_dataset.drop(['t_img_date'], axis=1)
+    #Changing the column names where every 't_' is replaced with 'turbine_'
+    dataset.columns = dataset.columns.str.replace('t_', 'turbine_')
+    #Changing the column names where every 'p_' is replaced with 'project_'
+    dataset.columns = dataset.columns.str.replace('p_', 'project_')
+    #Changing the column names of project_cap, turbine_cap, turbine_manu, turbine_hh, turbine_rd, turbine_rsa and turbine_ttlh to their full names
+    dataset.rename(columns={'project_cap':'project_capacity', 'turbine_cap':'turbine_capacity', 'turbine_manu':'turbine_manufacturer', 'turbine_hh':'turbine_hub_height',
+                            'turbine_rd':'turbine_rotor_diameter', 'turbine_rsa':'turbine_rotor_swept_area', 'turbine_ttlh':'turbine_tower_total_height'}, inplace=True)
+    return dataset
+
+#Function that replaces the 'missing' labels of the text columns and normalizes the unknown project names
+def replace_missing_labels(dataset):
+    #Changing 'missing' turbine_manufacturer, turbine_model, faa_ors and faa_asn values to 'Unknown'
+    for column in ['turbine_manufacturer', 'turbine_model', 'faa_ors', 'faa_asn']:
+        dataset[column] = dataset[column].replace('missing', 'Unknown')
+    #Changing 'missing' usgs_pr_id and eia_id values to NaN
+    for column in ['usgs_pr_id', 'eia_id']:
+        dataset[column] = dataset[column].replace('missing', np.nan)
+    ##Addressing unknown project name values with 'Unknown' if the first 7 characters of the project name are 'unknown'
+    dataset.loc[(dataset['project_name'].str[:7] == 'unknown'), 'project_name'] = 'Unknown'
+    return dataset
+
+
+###Data cleaning
+#Function that takes the raw United States Wind Turbine Database dataframe and returns the cleaned dataset used by the analysis functions
+#diagnostics=True prints the checks and summary statistics of every stage, and every stage is reported to the stage hooks of turbine_profiling
+def clean_dataset(raw_dataset, diagnostics=False):
+    with stage('clean.rename_columns', len(raw_dataset)):
+        dataset = rename_columns(raw_dataset)
+    if diagnostics:
+        #checking to make sure the t_img_date column was dropped and no null values
+        print(dataset.isnull().sum())
+        #Checking to make sure the column names were changed
+        print(dataset.columns)
+
+        #Initial summary statistics table
+        print(dataset.describe())
+        #Summary stats for the numerical columns of the dataset: turbine_capacity, turbine_hub_height, turbine_rotor_diameter, turbine_rotor_swept_area, turbine_tower_total_height
+        print(dataset[DIMENSION_COLUMNS].describe())
+        #counting the number of negative values in each of the above columns
+        print((dataset[DIMENSION_COLUMNS] < 0).sum())
+        #counting the number of zero values in each of the above columns
+        print((dataset[DIMENSION_COLUMNS] == 0).sum())
+        #counting the unique number of negative values in each of the above columns
+        print((dataset[DIMENSION_COLUMNS] < 0).nunique())
+
+    #Changing 'missing' labels to 'Unknown' or NaN and normalizing the unknown project names
+    with stage('clean.replace_missing_labels', len(dataset)):
+        dataset = replace_missing_labels(dataset)
+
+    ##Handling special cases of MISSING YEAR values based off of other information in dataset, note that excel filtering was used to identify these special cases before dropping NaN values
+    with stage('clean.impute_project_year', len(dataset)):
+        dataset = impute_project_year(dataset, project_year_statistics(dataset))
+    if diagnostics:
+        #printing out the number of NaN values in the project_year column
+        print(dataset['project_year'].isnull().sum())
+
+    ##Addressing missing -9999 values of turbine_capacity, turbine_hub_height, turbine_rotor_diameter, turbine_rotor_swept_area and turbine_tower_total_height in a single pass
+    #calculating the per-year sums and counts of the reported values for all five columns with one grouped aggregation
+    with stage('clean.year_statistics', len(dataset)):
+        statistics = year_statistics(dataset, DIMENSION_COLUMNS)
+    if diagnostics:
+        #printing the years without any reported values for each column, these are filled with the rounded mean of the closest year that has data
+        print((statistics[1] == 0).apply(lambda x: list(x[x].index)))
+    #replacing every missing value with the mean of its project year
+    with stage('clean.impute_by_year', len(dataset)):
+        dataset = impute_by_year(dataset, DIMENSION_COLUMNS, statistics=statistics)
+    if diagnostics:
+        #checking to see if there are any more NaN values in the dimension columns
+        print(dataset[DIMENSION_COLUMNS].isnull().sum())
+
+    return dataset
@@ -0,0 +1,98 @@
+###Importing the libraries
+import numpy as np
+import pandas as pd
+
+
+###Compact settings
+#Text columns whose number of distinct values is at most this share of their reported values are stored as categoricals
+CATEGORY_RATIO = 0.5
+
+#Category dictionaries shared by every dataset compacted in this process, so datasets holding the same labels keep a single copy of them
+_dictionaries = {}
+
+
+###Categorical encoding
+#Function that returns the categorical dtype of a text column, reusing the shared dictionary of the column when it already holds every label and replacing it with a larger one otherwise
+#Datasets compacted before the dictionary grew keep the one they were compacted with
+def shared_category_dtype(column, values):
+    #the labels of a categorical column are its categories, so the column itself never has to be turned back into text
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        labels = values.cat.categories
+    else:
+        labels = pd.Index(values.dropna().unique())
+    dtype = _dictionaries.get(column)
+    if dtype is None:
+        dtype = pd.CategoricalDtype(labels.sort_values())
+    #checking the labels against the dictionary with a hash lookup, Index.isin goes through Python objects for arrow-backed text
+    elif not labels.equals(dtype.categories) and (dtype.categories.get_indexer(labels) < 0).any():
+        dtype = pd.CategoricalDtype(dtype.categories.union(labels))
+    _dictionaries[column] = dtype
+    return dtype
+
+#Function that checks if a column holds text that is worth storing as a categorical
+def is_category_column(values, category_ratio=CATEGORY_RATIO):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return True
+    if values.dtype != object and not isinstance(values.dtype, pd.StringDtype):
+        return False
+    return values.nunique() <= category_ratio * max(values.count(), 1)
+
+
+###Numeric downcasting
+#Function that returns the narrowest dtype holding every value of a numerical column exactly
+#Integers are downcast to the smallest signed integer that fits their range, floats to float32 only when no value changes
+def narrowest_dtype(values):
+    if not isinstance(values.dtype, np.dtype) or values.dtype.kind not in 'iuf':
+        return values.dtype
+    if values.dtype.kind in 'iu':
+        return pd.to_numeric(values, downcast='integer').dtype
+    array = values.to_numpy()
+    if values.dtype.itemsize > 4 and np.array_equal(array.astype(np.float32).astype(values.dtype), array, equal_nan=True):
+        return np.dtype(np.float32)
+    return values.dtype
+
+
+###Compacting datasets
+#Function that returns a categorical column on the shared dictionary without encoding it again, when the dictionary holds the same categories in the same order
+#Otherwise the column keeps its own dictionary (it already covers every label of the column), so an already compact dataset is never re-encoded
+def _on_shared_dictionary(values, dtype):
+    if not values.cat.categories.equals(dtype.categories):
+        return values
+    return pd.Series(pd.Categorical.from_codes(values.cat.codes.to_numpy(), dtype=dtype), index=values.index, name=values.name)
+
+#Function that returns a compact copy of a dataset, with its low-cardinality text columns stored as categoricals with shared dictionaries and its numerical columns downcast
+#Grouping and counting a categorical column works on its integer codes, so value_counts and groupby (with observed=True) get faster as well
+#Columns that are compact already (e.g. those of a snapshot) are kept as they are, so compacting a compact dataset costs next to nothing
+def compact_dataset(dataset, category_ratio=CATEGORY_RATIO):
+    dtypes = {}
+    shared = {}
+    for column in dataset.columns:
+        values = dataset[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            shared[column] = _on_shared_dictionary(values, shared_category_dtype(column, values))
+        elif is_category_column(values, category_ratio):
+            dtypes[column] = shared_category_dtype(column, values)
+        else:
+            dtype = narrowest_dtype(values)
+            if dtype != values.dtype:
+                dtypes[column] = dtype
+    compacted = dataset.astype(dtypes) if dtypes else dataset.copy(deep=False)
+    for column, values in shared.items():
+        compacted[column] = values
+    return compacted
+
+#Function that moves the categorical columns of a dataset that is compact already (e.g. a snapshot) to the dictionaries shared in this process, leaving every other column untouched
+def share_dictionaries(dataset):
+    shared = dataset.copy(deep=False)
+    for column in dataset.select_dtypes('category').columns:
+        shared[column] = _on_shared_dictionary(dataset[column], shared_category_dtype(column, dataset[column]))
+    return shared
+
+#Function that reports the dtype and memory in bytes of every column before and after compacting a dataset, with the total in the last row
+#The categories of a column are counted in full for every dataset even though compacted datasets share them
+def memory_report(before, after):
+    report = pd.DataFrame({'dtype_before': before.dtypes.astype(str), 'dtype_after': after.dtypes.astype(str),
+                           'bytes_before': before.memory_usage(index=False, deep=True), 'bytes_after': after.memory_usage(index=False, deep=True)})
+    report.loc['total'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum()]
+    report['reduction'] = 1 - report['bytes_after'] / report['bytes_before']
+    return report
@@ -0,0 +1,136 @@
+###Importing the libraries
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+###Correlation settings
+#Absolute correlation coefficients (rounded to 3 decimals) from which a correlation is described as strong or moderate, anything lower is weak
+STRONG_CORRELATION = 0.7
+MODERATE_CORRELATION = 0.3
+#Number of bootstrap resamples computed by one task of the process pool
+BOOTSTRAP_BATCH_SIZE = 50
+
+
+###Correlation strength
+#Function that describes a correlation coefficient as weak, moderate or strong
+def correlation_strength(coefficient):
+    coefficient = abs(round(coefficient, 3))
+    if coefficient >= STRONG_CORRELATION:
+        return 'strong'
+    elif coefficient >= MODERATE_CORRELATION:
+        return 'moderate'
+    return 'weak'
+
+#Function that describes an array of correlation coefficients as weak, moderate or strong in one vectorized step
+def correlation_strengths(coefficients):
+    coefficients = np.abs(np.round(coefficients, 3))
+    return np.select([coefficients >= STRONG_CORRELATION, coefficients >= MODERATE_CORRELATION], ['strong', 'moderate'], 'weak')
+
+
+###Correlation matrices
+#Function that ranks every column of a 2D array (ties get their average rank, NaN stays NaN), turning a Pearson correlation into a Spearman correlation
+def _rank_columns(values):
+    return pd.DataFrame(values).rank(method='average').to_numpy()
+
+#Function that calculates the Pearson correlation matrix and the number of observations of every pair of columns of a 2D array in one vectorized pass
+#Like pandas, rows where one of the two values is missing are left out of that pair only
+def _pearson_matrix(values):
+    valid = ~np.isnan(values)
+    if valid.all():
+        centered = values - values.mean(axis=0)
+        scale = np.sqrt((centered ** 2).sum(axis=0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            matrix = (centered.T @ centered) / np.outer(scale, scale)
+        observations = np.full(matrix.shape, len(values))
+    else:
+        #centering on the column means first keeps the pairwise sums from cancelling out
+        centered = np.where(valid, values - np.nanmean(values, axis=0), 0.0)
+        mask = valid.astype(float)
+        observations = mask.T @ mask
+        sums = centered.T @ mask
+        squares = (centered ** 2).T @ mask
+        products = centered.T @ centered
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = products - sums * sums.T / observations
+            variance = (squares - sums ** 2 / observations) * (squares.T - sums.T ** 2 / observations)
+            matrix = covariance / np.sqrt(variance)
+    return np.clip(matrix, -1.0, 1.0), observations
+
+#Function that calculates the Spearman correlation matrix of a 2D array, ranking the columns once in one vectorized pass
+#Pairs whose columns are missing values on different rows are ranked again over the rows both columns share, the same way pandas does
+def _spearman_matrix(values):
+    matrix, observations = _pearson_matrix(_rank_columns(values))
+    valid = ~np.isnan(values)
+    incomplete = np.flatnonzero(~valid.all(axis=0))
+    for first in incomplete:
+        for second in range(values.shape[1]):
+            shared = valid[:, first] & valid[:, second]
+            #the ranks of the whole columns are the ranks over the shared rows when neither column is missing anything the other has
+            if second == first or (second in incomplete and second < first) or ((shared == valid[:, first]).all() and (shared == valid[:, second]).all()):
+                continue
+            pair_matrix = _pearson_matrix(_rank_columns(values[shared][:, [first, second]]))[0]
+            matrix[first, second] = matrix[second, first] = pair_matrix[0, 1]
+    return matrix, observations
+
+#Function that calculates the Pearson or Spearman correlation matrix of a 2D array
+def _correlation_matrix(values, method):
+    if method == 'spearman':
+        return _spearman_matrix(values)
+    elif method != 'pearson':
+        raise ValueError(f"Unknown correlation method '{method}', use 'pearson' or 'spearman'")
+    return _pearson_matrix(values)
+
+#Function that calculates the correlation matrices of a batch of bootstrap resamples, run in the worker processes
+def _bootstrap_batch(values, method, resamples, seed):
+    generator = np.random.default_rng(seed)
+    matrices = np.empty((resamples, values.shape[1], values.shape[1]))
+    for resample in range(resamples):
+        rows = generator.integers(0, len(values), len(values))
+        matrices[resample] = _correlation_matrix(values[rows], method)[0]
+    return matrices
+
+#Function that calculates the bootstrap confidence intervals of the correlation matrices of every group, spreading batches of resamples over a process pool
+#Every batch gets its own seed spawned from the given seed in a fixed order, so the intervals do not depend on the number of workers
+def _bootstrap_intervals(group_values, method, bootstrap, confidence, seed, n_jobs):
+    batches = [(group, min(BOOTSTRAP_BATCH_SIZE, bootstrap - start)) for group in range(len(group_values)) for start in range(0, bootstrap, BOOTSTRAP_BATCH_SIZE)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    tasks = [(group_values[group], method, resamples, batch_seed) for (group, resamples), batch_seed in zip(batches, seeds)]
+    if n_jobs == 1:
+        results = [_bootstrap_batch(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=n_jobs or os.cpu_count()) as executor:
+            results = list(executor.map(_bootstrap_batch, *zip(*tasks)))
+    tail = (1 - confidence) / 2 * 100
+    intervals = []
+    for group in range(len(group_values)):
+        matrices = np.concatenate([result for (batch_group, _), result in zip(batches, results) if batch_group == group])
+        intervals.append(np.nanpercentile(matrices, [tail, 100 - tail], axis=0))
+    return intervals
+
+#Function that calculates the correlation of every pair of the given numerical columns in one vectorized pass per group, returning one row per pair
+#method can be 'pearson' or 'spearman', group_by a column such as 'turbine_state' or 'project_year' to get the pairs of every group,
+#and bootstrap a number of resamples to add confidence intervals computed in parallel on n_jobs processes (all cores by default)
+def correlation_matrix(dataset, columns, method='pearson', group_by=None, bootstrap=0, confidence=0.95, seed=0, n_jobs=None):
+    columns = list(columns)
+    if group_by is None:
+        groups = [(None, dataset[columns].to_numpy(dtype=float))]
+    else:
+        groups = [(group, rows.to_numpy(dtype=float)) for group, rows in dataset[columns].groupby(dataset[group_by], observed=True)]
+    first, second = np.triu_indices(len(columns), k=1)
+    intervals = _bootstrap_intervals([values for _, values in groups], method, bootstrap, confidence, seed, n_jobs) if bootstrap else None
+    results = []
+    for position, (group, values) in enumerate(groups):
+        matrix, observations = _correlation_matrix(values, method)
+        result = pd.DataFrame({'column1': np.array(columns)[first], 'column2': np.array(columns)[second], 'method': method,
+                               'coefficient': matrix[first, second], 'observations': observations[first, second].astype(int)})
+        if group_by is not None:
+            result.insert(0, group_by, group)
+        if intervals is not None:
+            result['ci_low'] = intervals[position][0][first, second]
+            result['ci_high'] = intervals[position][1][first, second]
+        results.append(result)
+    result = pd.concat(results, ignore_index=True)
+    result['strength'] = correlation_strengths(result['coefficient'].to_numpy())
+    return result
@@ -0,0 +1,112 @@
+###Importing the libraries
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import turbine_spatial
+from turbine_profiling import stage
+
+
+###Cube settings
+#Dimensions of the aggregate cube, every query groups and filters on a subset of these
+CUBE_DIMENSIONS = ['project_year', 'turbine_state', 'turbine_manufacturer']
+
+#The cube built from the current dataset, queries are answered from it until the dataset changes
+_cube = None
+#The current dataset, kept to build its cube and the cubes of spatial regions on first use
+_dataset = None
+
+
+###Building the cube
+#Function that returns the numerical columns of a dataset that the cube sums
+def numerical_columns(dataset):
+    return [column for column in dataset.select_dtypes('number').columns if column not in CUBE_DIMENSIONS]
+
+#Function that aggregates the cleaned dataset once into turbine counts, sums and non-null counts of every numerical column, and the distinct projects of every year x state x manufacturer cell
+def build_cube(dataset):
+    keys = [dataset[dimension] for dimension in CUBE_DIMENSIONS]
+    columns = numerical_columns(dataset)
+    #keeping rows with a missing state or manufacturer so queries that do not group on them still count every turbine
+    grouped = dataset[columns].groupby(keys, observed=True, dropna=False)
+    cells = pd.concat([grouped.size().rename('turbines'), grouped.sum().add_prefix('sum_'), grouped.count().add_prefix('count_')], axis=1).reset_index()
+    #the distinct project sketch of a cell is the set of integer codes of its project names, stored as one deduplicated row per cell and project
+    project_codes, project_names = pd.factorize(dataset['project_name'])
+    projects = pd.DataFrame({dimension: dataset[dimension].array for dimension in CUBE_DIMENSIONS})
+    projects['project'] = project_codes
+    projects = projects[projects['project'] >= 0].drop_duplicates(ignore_index=True)
+    return {'cells': cells, 'projects': projects, 'project_names': project_names, 'columns': columns}
+
+#Function that sets the dataset of the cube and clears the memoized queries and region cubes of the previous one, the cube itself is only built by the first query
+def set_cube_dataset(dataset):
+    global _cube, _dataset
+    _dataset = dataset
+    _cube = None
+    _query.cache_clear()
+    _region_cube.cache_clear()
+
+#Function that returns the current dataset, raising an error when no dataset has been set yet
+def _current_dataset():
+    if _dataset is None:
+        raise RuntimeError('No dataset has been set for the aggregate cube, call set_cube_dataset(dataset) first')
+    return _dataset
+
+#Function that returns the cube of the current dataset, building it on first use and raising an error when no dataset has been set yet
+def get_cube():
+    global _cube
+    if _cube is None:
+        current_dataset = _current_dataset()
+        with stage('aggregate.build_cube', len(current_dataset)):
+            _cube = build_cube(current_dataset)
+    return _cube
+
+#Function that builds the cube of the turbines inside a spatial region (see turbine_spatial.radius_region and box_region), memoized per region
+@lru_cache(maxsize=64)
+def _region_cube(region):
+    return build_cube(_current_dataset().take(turbine_spatial.region_rows(region)))
+
+
+###Memoized queries
+#Function that turns the categorical index levels of a query result (from a compact dataset) into plain labels, so results can be extended like those of text columns (e.g. with an 'Other' slice)
+def _plain_labels(result):
+    if isinstance(result.index, pd.MultiIndex):
+        levels = [level.astype(level.categories.dtype) if isinstance(level, pd.CategoricalIndex) else level for level in result.index.levels]
+        result.index = result.index.set_levels(levels)
+    elif isinstance(result.index, pd.CategoricalIndex):
+        result.index = result.index.astype(result.index.categories.dtype)
+    return result
+
+#Function that turns the query arguments into hashable tuples so they can be used as cache keys
+def _query_key(by, filters):
+    if isinstance(by, str):
+        by = (by,)
+    filters = tuple(sorted((dimension, tuple(np.atleast_1d(values).tolist())) for dimension, values in (filters or {}).items()))
+    return tuple(by), filters
+
+#Function that answers a query from the cube, results are memoized until the cube is rebuilt
+@lru_cache(maxsize=1024)
+def _query(kind, column, by, filters, region):
+    cube = get_cube() if region is None else _region_cube(region)
+    table = cube['projects'] if kind == 'projects' else cube['cells']
+    for dimension, values in filters:
+        table = table[table[dimension].isin(values)]
+    grouped = table.groupby(list(by), observed=True)
+    if kind == 'projects':
+        return _plain_labels(grouped['project'].nunique())
+    if kind == 'mean':
+        return _plain_labels(grouped[f'sum_{column}'].sum() / grouped[f'count_{column}'].sum())
+    return _plain_labels(grouped['turbines'].sum())
+
+#Function that returns the number of turbines grouped by one or more cube dimensions, optionally filtered to some values of the dimensions (e.g. filters={'turbine_state': ['CA', 'TX']})
+#Every query can also be limited to the turbines inside a spatial region
+def turbine_counts(by='turbine_state', filters=None, region=None):
+    return _query('counts', None, *_query_key(by, filters), region).copy()
+
+#Function that returns the average of a numerical column grouped by one or more cube dimensions
+#The column is checked against the dtypes of the dataset, so a region query never builds the cube of the whole dataset
+def column_mean(column, by='project_year', filters=None, region=None):
+    if column not in numerical_columns(_current_dataset()):
+        raise KeyError(f'{column} is not a numerical column of the aggregate cube')
+    return _query('mean', column, *_query_key(by, filters), region).copy()
+
+#Function that returns the number of distinct project names grouped by one or more cube dimensions
+def distinct_projects(by='turbine_state', filters=None, region=None):
+    return _query('projects', None, *_query_key(by, filters), region).copy()
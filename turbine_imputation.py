@@ -0,0 +1,104 @@
+###Importing the libraries
+import numpy as np
+import pandas as pd
+
+
+###Imputation settings
+#Numerical columns describing the turbine dimensions, missing values are imputed with the mean of their project year
+DIMENSION_COLUMNS = ['turbine_capacity', 'turbine_hub_height', 'turbine_rotor_diameter', 'turbine_rotor_swept_area', 'turbine_tower_total_height']
+#Value the USWTDB uses for missing numerical values
+MISSING_VALUE = -9999
+#Turbine capacities whose rounded average project year fills missing project years, the first capacity with reported years is used
+#600 is the Westinghouse special case, 3200 Senivon USA Corp, 100 Northern Power Systems and 60 Seaforth
+PROJECT_YEAR_CAPACITIES = [600, 3200, 100, 60]
+
+
+###Project year imputation
+#Function that calculates the sums and counts of the reported project years for each of the special case turbine capacities
+def project_year_statistics(dataset):
+    years = dataset['project_year'].replace(MISSING_VALUE, np.nan)
+    statistics = years.groupby(dataset['turbine_capacity']).agg(['sum', 'count'])
+    return statistics.reindex(PROJECT_YEAR_CAPACITIES, fill_value=0)
+
+#Function that returns the rounded average project year of the first special case capacity that has reported years, or NaN when none of them do
+def project_year_fill_value(statistics):
+    available = statistics[statistics['count'] > 0]
+    if available.empty:
+        return np.nan
+    return round(available['sum'].iloc[0] / available['count'].iloc[0])
+
+#Function that fills the missing project years, applies the Scioto Ridg special case and drops the rows whose year could not be filled
+#A fill_value can be given instead of the statistics when the year is not known yet, e.g. to mark the filled rows during a first pass over the data
+def impute_project_year(dataset, statistics=None, fill_value=None):
+    if fill_value is None:
+        fill_value = project_year_fill_value(project_year_statistics(dataset) if statistics is None else statistics)
+    #Converting the project_year column values of -9999 to NaN and filling them with the average year of the special case capacities
+    dataset['project_year'] = dataset['project_year'].replace(MISSING_VALUE, np.nan)
+    dataset['project_year'] = dataset['project_year'].fillna(fill_value)
+    ##Multiple cases of Siemens Gamesa Renewable Energy turbines located on Scioto Ridg report missing years, when crossexamined by filtering only for the company it becomes apparent these values should have a year value of 2020
+    dataset.loc[(dataset['turbine_manufacturer'] == 'Siemens Gamesa Renewable Energy') & (dataset['project_name'].str.contains('Scioto Ridg')), 'project_year'] = 2020
+    ##Dropping all observations that have NaN values in the project_year column and converting project_year to integer
+    dataset = dataset.dropna(subset=['project_year'])
+    dataset['project_year'] = dataset['project_year'].astype(int)
+    return dataset
+
+
+###Year statistics
+#Function that calculates the per-year sums and counts of the reported (non -9999) values for all given columns in a single grouped aggregation
+#Sums and counts are returned instead of means so statistics of separate chunks or releases can simply be added together
+def year_statistics(dataset, columns=DIMENSION_COLUMNS, year_column='project_year'):
+    values = dataset[columns].replace(MISSING_VALUE, np.nan)
+    statistics = values.groupby(dataset[year_column]).agg(['sum', 'count'])
+    sums = statistics.xs('sum', axis=1, level=1)
+    counts = statistics.xs('count', axis=1, level=1)
+    return sums, counts
+
+#Function that adds two sets of year statistics together, years missing from one of them count as zero
+def combine_year_statistics(statistics, other_statistics):
+    sums = statistics[0].add(other_statistics[0], fill_value=0)
+    counts = statistics[1].add(other_statistics[1], fill_value=0)
+    return sums, counts
+
+
+###Fill table
+#Function that builds the table of values used to fill each column for each year
+#Years with reported values use the mean of that year, years without any reported values use the rounded mean of the closest year that has data, ties going to the following year
+def year_fill_table(statistics, years=None):
+    sums, counts = statistics
+    means = sums / counts.where(counts > 0)
+    if years is not None:
+        means = means.reindex(means.index.union(pd.Index(years).dropna()))
+    index = means.index.to_numpy(dtype=float)
+    table = means.to_numpy(dtype=float, copy=True)
+    for position in range(table.shape[1]):
+        column = table[:, position]
+        has_data = ~np.isnan(column)
+        if has_data.all() or not has_data.any():
+            continue
+        #finding the closest year with data on either side of every year without data
+        data_years = index[has_data]
+        data_means = column[has_data]
+        gap_years = index[~has_data]
+        following = np.searchsorted(data_years, gap_years).clip(1, len(data_years) - 1) if len(data_years) > 1 else np.zeros(len(gap_years), dtype=int)
+        preceding = (following - 1).clip(0)
+        use_following = np.abs(data_years[following] - gap_years) <= np.abs(gap_years - data_years[preceding])
+        nearest = np.where(use_following, following, preceding)
+        column[~has_data] = np.round(data_means[nearest])
+    return pd.DataFrame(table, index=means.index, columns=means.columns)
+
+
+###Imputation
+#Function that imputes the -9999 values of all given columns with the year fill table, using a single indexed take per column instead of one groupby per column
+#The dataset is filled in place and returned, precomputed statistics (e.g. from a previous pass over the data) can be passed in to skip the aggregation
+def impute_by_year(dataset, columns=DIMENSION_COLUMNS, year_column='project_year', statistics=None):
+    if statistics is None:
+        statistics = year_statistics(dataset, columns, year_column)
+    years = dataset[year_column].to_numpy()
+    table = year_fill_table(statistics, years=np.unique(years)).reindex(columns=columns)
+    fill_values = table.to_numpy()[table.index.get_indexer(years)]
+    values = dataset[columns].replace(MISSING_VALUE, np.nan).to_numpy(dtype=float, copy=True)
+    missing = np.isnan(values)
+    values[missing] = fill_values[missing]
+    for position, column in enumerate(columns):
+        dataset[column] = values[:, position]
+    return dataset
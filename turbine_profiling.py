@@ -0,0 +1,103 @@
+###Importing the libraries
+import json
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+
+###Stage hooks
+##Every pipeline stage runs inside stage(name, rows), which hands a record of the stage to the registered hooks once it is done:
+#stage: the name of the stage, e.g. 'clean.impute_by_year'
+#parent: the name of the stage it ran in, or None
+#rows: the number of rows it processed
+#wall_seconds: its wall time
+#peak_memory_bytes: the peak of the memory allocated on top of what was allocated when it started, or None when allocations are not being traced (see profile_stages)
+#Without hooks a stage costs nothing but the with block
+
+#Functions called with the record of every finished stage
+_hooks = []
+#Records of the stages that are running, innermost last
+_running = []
+
+#Function that registers a function to be called with the record of every finished stage
+def add_stage_hook(hook):
+    _hooks.append(hook)
+
+#Function that removes a registered stage hook
+def remove_stage_hook(hook):
+    _hooks.remove(hook)
+
+#Function that records the wall time, peak memory and rows of a pipeline stage for the registered hooks
+#The record is handed to the with block, so rows that are only known at the end can still be set (record['rows'] = len(result))
+@contextmanager
+def stage(name, rows=None):
+    if not _hooks:
+        yield {}
+        return
+    record = {'stage': name, 'parent': _running[-1]['stage'] if _running else None, 'rows': rows}
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        #handing the peak so far to the enclosing stage before resetting it for this one
+        if _running:
+            _running[-1]['_peak'] = max(_running[-1].get('_peak', 0), peak)
+        tracemalloc.reset_peak()
+        record['_start'] = current
+        record['_peak'] = current
+    _running.append(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['wall_seconds'] = time.perf_counter() - start
+        _running.pop()
+        start_memory = record.pop('_start', None)
+        peak = record.pop('_peak', None)
+        record['peak_memory_bytes'] = None
+        if start_memory is not None and tracemalloc.is_tracing():
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            record['peak_memory_bytes'] = peak - start_memory
+            if _running:
+                _running[-1]['_peak'] = max(_running[-1].get('_peak', 0), peak)
+        for hook in list(_hooks):
+            hook(record)
+
+#Function that collects the records of every stage run inside the with block, tracing memory allocations so the records hold the peak memory of the stages
+@contextmanager
+def profile_stages():
+    records = []
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    add_stage_hook(records.append)
+    try:
+        yield records
+    finally:
+        remove_stage_hook(records.append)
+        if started:
+            tracemalloc.stop()
+
+
+###Reports
+#Function that describes the machine and library versions a report was made on
+def environment():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'machine': platform.machine(), 'cpu_count': os.cpu_count(),
+            'numpy': np.__version__, 'pandas': pd.__version__}
+
+#Function that writes a machine-readable JSON report with the time and environment it was made in, every keyword argument becomes a section of the report
+def write_report(path, **sections):
+    report = {'created': datetime.now(timezone.utc).isoformat(), 'environment': environment(), **sections}
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as file:
+        json.dump(report, file, indent=2, default=str)
+    return report
+
+#Function that reads a JSON report
+def read_report(path):
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,218 @@
+###Importing the libraries
+import os
+import shutil
+import tempfile
+import uuid
+import numpy as np
+import pandas as pd
+import turbine_snapshot
+from turbine_cleaning import rename_columns, replace_missing_labels
+from turbine_imputation import (DIMENSION_COLUMNS, MISSING_VALUE, impute_by_year, impute_project_year,
+                                project_year_fill_value, project_year_statistics, year_fill_table, year_statistics)
+
+
+###Refresh settings
+#Directory the refresh state is written to, one subdirectory per source file and version of the cleaning rules
+REFRESH_DIR = os.path.join(turbine_snapshot.SNAPSHOT_DIR, 'refresh')
+#Names of the per-row flags recording which dimension values were imputed rather than reported
+IMPUTED_FLAGS = [f'imputed_{column}' for column in DIMENSION_COLUMNS]
+
+
+###Refresh state
+##The refresh state holds everything needed to apply the next USWTDB release as a delta:
+#dataset: the cleaned dataset
+#rows: per case_id, the hash of the raw row, the raw project year and whether each dimension value was imputed
+#statistics: the per-year sums and counts of the reported dimension values
+#project_year_statistics: the sums and counts of the reported project years of the special case capacities
+
+#Function that hashes every raw row so changed turbines can be found without comparing them column by column
+def row_hashes(raw_dataset):
+    return pd.Series(pd.util.hash_pandas_object(raw_dataset, index=False).to_numpy(), index=raw_dataset['case_id'].to_numpy())
+
+#Function that returns the raw columns renamed the same way the cleaning does, keyed by their cleaned name
+def _renamed_raw_columns(raw_dataset):
+    raw_columns = raw_dataset.columns.drop('t_img_date')
+    return dict(zip(rename_columns(raw_dataset.iloc[:0]).columns, raw_columns))
+
+#Function that returns the reported (not imputed) dimension values of cleaned rows with their project year, imputed values becoming NaN
+def _reported_values(dataset, flags):
+    reported = dataset[DIMENSION_COLUMNS].mask(flags.to_numpy())
+    reported['project_year'] = dataset['project_year'].to_numpy()
+    return reported
+
+#Function that calculates the per-year statistics of the reported (not imputed) dimension values of cleaned rows
+def _reported_statistics(dataset, flags):
+    return year_statistics(_reported_values(dataset, flags), DIMENSION_COLUMNS)
+
+#Function that calculates the project year statistics of cleaned rows from their raw project years and reported capacities
+def _reported_project_year_statistics(dataset, rows):
+    capacity = dataset['turbine_capacity'].mask(rows['imputed_turbine_capacity'].to_numpy(), MISSING_VALUE)
+    return project_year_statistics(pd.DataFrame({'project_year': rows['raw_project_year'].to_numpy(), 'turbine_capacity': capacity.to_numpy()}))
+
+#Function that builds the refresh state of a release from its raw rows and the dataset clean_dataset produced from them
+def build_refresh_state(raw_dataset, dataset):
+    names = _renamed_raw_columns(raw_dataset)
+    #clean_dataset keeps the index of the raw rows, so the raw values of the kept rows can be looked up directly
+    kept_raw = raw_dataset.loc[dataset.index]
+    flags = kept_raw[[names[column] for column in DIMENSION_COLUMNS]].replace(MISSING_VALUE, np.nan).isna()
+    flags.columns = IMPUTED_FLAGS
+    rows = flags.set_axis(kept_raw['case_id'].to_numpy())
+    rows.insert(0, 'raw_project_year', kept_raw[names['project_year']].replace(MISSING_VALUE, np.nan).to_numpy())
+    rows.insert(0, 'row_hash', row_hashes(kept_raw).to_numpy())
+    #the project year statistics cover every raw row, including the ones dropped for having no year
+    raw_years = raw_dataset[[names['project_year'], names['turbine_capacity']]].set_axis(['project_year', 'turbine_capacity'], axis=1)
+    return {'dataset': dataset.reset_index(drop=True),
+            'rows': rows,
+            'statistics': _reported_statistics(dataset, flags),
+            'project_year_statistics': project_year_statistics(raw_years)}
+
+
+###Incremental refresh
+#Function that applies a new raw release to a refresh state, cleaning only the added and changed turbines, removing the deleted ones and re-filling the imputed values whose year mean shifted
+#Returns the new refresh state and a summary of the changes
+def refresh_dataset(state, raw_dataset):
+    dataset = state['dataset'].set_index(state['dataset']['case_id'].to_numpy())
+    rows = state['rows']
+    new_hashes = row_hashes(raw_dataset)
+
+    ##Diffing the new release against the previous one by case_id
+    common = new_hashes.index.intersection(rows.index)
+    unchanged = common[new_hashes.loc[common].to_numpy() == rows.loc[common, 'row_hash'].to_numpy()]
+    removed = rows.index.difference(new_hashes.index)
+    retracted = rows.index.difference(unchanged)
+    incoming = new_hashes.index.difference(unchanged)
+    summary = {'added': len(new_hashes.index.difference(rows.index)), 'changed': len(common) - len(unchanged), 'removed': len(removed)}
+
+    ##Updating the project year statistics with the removed, changed and added rows
+    project_statistics = state['project_year_statistics'] - _reported_project_year_statistics(dataset.loc[retracted], rows.loc[retracted])
+    incoming_raw = raw_dataset[raw_dataset['case_id'].isin(incoming)]
+    incoming_rows = replace_missing_labels(rename_columns(incoming_raw))
+    project_statistics = project_statistics + project_year_statistics(incoming_rows)
+    #when the year used to fill missing project years changes, the rows whose year was filled move to another year and are cleaned again
+    old_year_fill = project_year_fill_value(state['project_year_statistics'])
+    new_year_fill = project_year_fill_value(project_statistics)
+    if old_year_fill != new_year_fill and not (pd.isna(old_year_fill) and pd.isna(new_year_fill)):
+        moved = unchanged[rows.loc[unchanged, 'raw_project_year'].isna().to_numpy()]
+        unchanged = unchanged.difference(moved)
+        retracted = retracted.union(moved)
+        moved_raw = raw_dataset[raw_dataset['case_id'].isin(moved)]
+        incoming_raw = pd.concat([incoming_raw, moved_raw])
+        incoming_rows = pd.concat([incoming_rows, replace_missing_labels(rename_columns(moved_raw))])
+
+    ##Cleaning the incoming rows up to the dimension imputation
+    incoming_rows.index = incoming_raw['case_id'].to_numpy()
+    raw_years = incoming_rows['project_year'].replace(MISSING_VALUE, np.nan)
+    incoming_rows = impute_project_year(incoming_rows, project_statistics)
+    incoming_flags = incoming_rows[DIMENSION_COLUMNS].replace(MISSING_VALUE, np.nan).isna()
+
+    ##Rebuilding the per-year statistics of the years the removed, changed and added rows belong to from the rows those years hold now
+    #subtracting and adding float sums would make the means depend on the order of past refreshes, summing the rows of a year in the order of the release gives the same means as cleaning it in full
+    order = raw_dataset['case_id'].to_numpy()
+    touched = pd.Index(dataset.loc[retracted, 'project_year']).union(pd.Index(incoming_rows['project_year'])).unique()
+    kept_years = dataset['project_year'].to_numpy()[dataset.index.get_indexer(unchanged)]
+    touched_kept = unchanged[np.isin(kept_years, touched)]
+    reported = pd.concat([_reported_values(dataset.loc[touched_kept], rows.loc[touched_kept, IMPUTED_FLAGS]),
+                          incoming_rows[DIMENSION_COLUMNS + ['project_year']]])
+    reported = reported.loc[order[np.isin(order, reported.index)]]
+    touched_sums, touched_counts = year_statistics(reported, DIMENSION_COLUMNS)
+    statistics = tuple(pd.concat([previous.drop(touched, errors='ignore'), rebuilt]).sort_index()
+                       for previous, rebuilt in zip(state['statistics'], (touched_sums, touched_counts)))
+
+    ##Re-filling the imputed values of the unchanged rows whose year fill value shifted
+    years = state['statistics'][0].index.union(statistics[0].index)
+    old_table = year_fill_table(state['statistics'], years=years).reindex(columns=DIMENSION_COLUMNS)
+    new_table = year_fill_table(statistics, years=years).reindex(columns=DIMENSION_COLUMNS)
+    shifted = (old_table.ne(new_table) & ~(old_table.isna() & new_table.isna())).to_numpy()
+    kept = dataset.take(dataset.index.get_indexer(unchanged))
+    positions = new_table.index.get_indexer(kept['project_year'])
+    refill = shifted[positions] & rows.loc[unchanged, IMPUTED_FLAGS].to_numpy()
+    if refill.any():
+        values = kept[DIMENSION_COLUMNS].to_numpy(dtype=float, copy=True)
+        values[refill] = new_table.to_numpy()[positions][refill]
+        kept[DIMENSION_COLUMNS] = values
+
+    ##Imputing the incoming rows with the updated statistics
+    incoming_rows = impute_by_year(incoming_rows, DIMENSION_COLUMNS, statistics=statistics)
+    incoming_state = incoming_flags.set_axis(IMPUTED_FLAGS, axis=1)
+    incoming_state.insert(0, 'raw_project_year', raw_years.loc[incoming_rows.index].to_numpy())
+    incoming_state.insert(0, 'row_hash', new_hashes.loc[incoming_rows.index].to_numpy())
+
+    ##Assembling the new release in the order of its raw rows
+    order = order[np.isin(order, unchanged) | np.isin(order, incoming_rows.index)]
+    new_dataset = pd.concat([kept, incoming_rows]).loc[order].reset_index(drop=True)
+    new_rows = pd.concat([rows.loc[unchanged], incoming_state]).loc[order]
+    summary['refilled_values'] = int(refill.sum())
+    return {'dataset': new_dataset, 'rows': new_rows, 'statistics': statistics, 'project_year_statistics': project_statistics}, summary
+
+
+###Saving and loading the refresh state
+#Function that returns the directory of the refresh state of a source file (see turbine_snapshot.source_name) for a version of the cleaning rules
+#Keying by the source keeps the releases of different inventories from being diffed against each other
+def refresh_state_dir(source_name, *rules):
+    return os.path.join(REFRESH_DIR, f'{source_name}-{turbine_snapshot.rules_digest(*rules)[:32]}')
+
+#Function that removes the refresh states of the same source file kept for older versions of the cleaning rules
+def prune_refresh_states(directory):
+    name = os.path.basename(directory)
+    source_name = name.rsplit('-', 1)[0]
+    for other_name in os.listdir(REFRESH_DIR):
+        if other_name != name and other_name.rsplit('-', 1)[0] == source_name:
+            shutil.rmtree(os.path.join(REFRESH_DIR, other_name), ignore_errors=True)
+
+#Function that moves a directory into place with one rename, first moving aside (and then removing) the directory it replaces
+#Another process can swap in its own directory in between, in which case that one is moved aside as well
+def _swap_directory(source, target):
+    while True:
+        try:
+            os.rename(source, target)
+            break
+        except OSError:
+            if not os.path.exists(target):
+                raise
+        retired = f'{target}.{uuid.uuid4().hex}.old'
+        try:
+            os.rename(target, retired)
+        except FileNotFoundError:
+            continue
+        shutil.rmtree(retired, ignore_errors=True)
+
+#Function that saves the refresh state of a source file as Arrow files and prunes the states of older cleaning rules, returning None when pyarrow is not installed
+#The files are written to a temporary directory that replaces the state with one rename, so a crash never leaves the files of two releases side by side
+def save_refresh_state(state, source_name, *rules):
+    directory = refresh_state_dir(source_name, *rules)
+    sums, counts = state['statistics']
+    statistics = pd.concat([sums.add_prefix('sum_'), counts.add_prefix('count_')], axis=1).rename_axis('project_year').reset_index()
+    frames = {'dataset': state['dataset'],
+              'rows': state['rows'].rename_axis('case_id').reset_index(),
+              'statistics': statistics,
+              'project_year_statistics': state['project_year_statistics'].rename_axis('turbine_capacity').reset_index()}
+    os.makedirs(REFRESH_DIR, exist_ok=True)
+    #the leading dot keeps the temporary directory out of prune_refresh_states
+    temporary_directory = tempfile.mkdtemp(dir=REFRESH_DIR, prefix=f'.{os.path.basename(directory)}.', suffix='.tmp')
+    try:
+        for name, frame in frames.items():
+            if turbine_snapshot.write_frame(frame, os.path.join(temporary_directory, f'{name}.arrow')) is None:
+                shutil.rmtree(temporary_directory, ignore_errors=True)
+                return None
+        _swap_directory(temporary_directory, directory)
+    except BaseException:
+        shutil.rmtree(temporary_directory, ignore_errors=True)
+        raise
+    prune_refresh_states(directory)
+    return directory
+
+#Function that loads the refresh state saved for a source file and the current cleaning rules, returning None when there is none
+def load_refresh_state(source_name, *rules):
+    directory = refresh_state_dir(source_name, *rules)
+    frames = {}
+    for name in ['dataset', 'rows', 'statistics', 'project_year_statistics']:
+        frames[name] = turbine_snapshot.read_frame(os.path.join(directory, f'{name}.arrow'))
+        if frames[name] is None:
+            return None
+    statistics = frames['statistics'].set_index('project_year')
+    sums = statistics[[f'sum_{column}' for column in DIMENSION_COLUMNS]].set_axis(DIMENSION_COLUMNS, axis=1)
+    counts = statistics[[f'count_{column}' for column in DIMENSION_COLUMNS]].set_axis(DIMENSION_COLUMNS, axis=1)
+    return {'dataset': frames['dataset'],
+            'rows': frames['rows'].set_index('case_id').rename_axis(None),
+            'statistics': (sums, counts),
+            'project_year_statistics': frames['project_year_statistics'].set_index('turbine_capacity').rename_axis(None)}
@@ -0,0 +1,126 @@
+###Importing the libraries
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+
+###Render settings
+#Image formats figures can be exported to
+EXPORT_FORMATS = ['png', 'svg']
+#Resolution of exported PNG figures
+EXPORT_DPI = 100
+#Scatterplots with more points than this are drawn as a density of binned counts instead of one marker per turbine
+DENSITY_POINT_LIMIT = 20000
+#Default number of bins along the x axis of a density plot
+DENSITY_BINS = 100
+
+
+###Figures
+#Function that creates a figure and its axes, figures that are exported are created without pyplot so no window or GUI backend is ever involved
+def new_figure(output=None, figsize=(20, 10)):
+    if output is None:
+        import matplotlib.pyplot as plt
+        figure = plt.figure(figsize=figsize)
+    else:
+        from matplotlib.figure import Figure
+        figure = Figure(figsize=figsize)
+    return figure, figure.add_subplot()
+
+#Function that shows a figure, or exports it to a PNG or SVG file (picked from the extension of output) without showing it
+def finish_figure(figure, output=None):
+    if output is None:
+        import matplotlib.pyplot as plt
+        plt.show()
+        plt.close(figure)
+        return None
+    extension = os.path.splitext(output)[1][1:].lower()
+    if extension not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported figure format '{extension}', use one of {EXPORT_FORMATS}")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    figure.savefig(output, format=extension, dpi=EXPORT_DPI, bbox_inches='tight')
+    return output
+
+
+###Density binning
+##Point-heavy plots are binned in NumPy first and only the non-empty bins are drawn, so the drawing cost depends on the number of bins instead of the number of turbines
+
+#Function that returns the extent of the points, widened around a single value so the bins never have a width of zero
+def _extent(x, y):
+    extent = []
+    for values in (x, y):
+        low, high = float(values.min()), float(values.max())
+        if low == high:
+            low, high = low - 0.5, high + 0.5
+        extent += [low, high]
+    return extent
+
+#Function that counts the points in every cell of a regular grid of bins x bins cells, returning the counts with the cell edges
+def histogram_bins(x, y, bins=DENSITY_BINS):
+    x_low, x_high, y_low, y_high = _extent(x, y)
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=bins, range=[[x_low, x_high], [y_low, y_high]])
+    return counts, x_edges, y_edges
+
+#Function that counts the points in every hexagon of a hexagonal grid with gridsize hexagons along the x axis, assigning points the same way matplotlib's hexbin does
+#Returns the centers and counts of the non-empty hexagons with the extent of the grid
+def hexagon_bins(x, y, gridsize=DENSITY_BINS):
+    x_low, x_high, y_low, y_high = extent = _extent(x, y)
+    #the grid is made of two rectangular lattices of centers, the second shifted by half a cell in both directions
+    x_cells = gridsize
+    y_cells = max(int(gridsize / math.sqrt(3)), 1)
+    #hexbin pads the x range by a tiny amount, the same padding keeps the centers computed here in the same hexagons when hexbin draws them
+    padding = 1e-9 * (x_high - x_low)
+    x_width = (x_high - x_low + 2 * padding) / x_cells
+    y_height = (y_high - y_low) / y_cells
+    x_scaled = (x - x_low + padding) / x_width
+    y_scaled = (y - y_low) / y_height
+    x_first, y_first = np.round(x_scaled), np.round(y_scaled)
+    x_second, y_second = np.floor(x_scaled), np.floor(y_scaled)
+    #every point goes to the closer of the nearest centers of the two lattices
+    in_first = (x_scaled - x_first) ** 2 + 3 * (y_scaled - y_first) ** 2 < (x_scaled - x_second - 0.5) ** 2 + 3 * (y_scaled - y_second - 0.5) ** 2
+    #counting on one integer key per hexagon, doubled lattice coordinates are whole numbers on both lattices
+    x_keys = (2 * np.where(in_first, x_first, x_second + 0.5)).astype(np.int64)
+    y_keys = (2 * np.where(in_first, y_first, y_second + 0.5)).astype(np.int64)
+    keys, counts = np.unique(x_keys * (2 * y_cells + 3) + y_keys, return_counts=True)
+    x_centers = x_low - padding + keys // (2 * y_cells + 3) / 2 * x_width
+    y_centers = y_low + keys % (2 * y_cells + 3) / 2 * y_height
+    return x_centers, y_centers, counts, extent
+
+#Function that draws the density of the points on the axes as a 2D histogram ('hist2d') or hexagons ('hexbin'), returning the centers and turbine counts of the non-empty bins
+def density_plot(axes, x, y, kind='hexbin', bins=DENSITY_BINS):
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    if len(x) == 0:
+        return pd.DataFrame({'x': [], 'y': [], 'turbines': []})
+    if kind == 'hist2d':
+        counts, x_edges, y_edges = histogram_bins(x, y, bins)
+        collection = axes.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0))
+        x_cells, y_cells = np.nonzero(counts)
+        cells = pd.DataFrame({'x': (x_edges[x_cells] + x_edges[x_cells + 1]) / 2, 'y': (y_edges[y_cells] + y_edges[y_cells + 1]) / 2,
+                              'turbines': counts[x_cells, y_cells].astype(int)})
+    elif kind == 'hexbin':
+        x_centers, y_centers, counts, extent = hexagon_bins(x, y, bins)
+        #drawing one weighted point per hexagon, which hexbin puts back in the same hexagon
+        collection = axes.hexbin(x_centers, y_centers, C=counts, gridsize=bins, extent=extent, reduce_C_function=np.sum)
+        cells = pd.DataFrame({'x': x_centers, 'y': y_centers, 'turbines': counts})
+    else:
+        raise ValueError(f"Unknown density kind '{kind}', use 'hist2d' or 'hexbin'")
+    axes.figure.colorbar(collection, ax=axes, label='Number of Wind Turbines')
+    return cells
+
+
+###Batch rendering
+#Function that renders a batch of figures on a process pool, every task holds the arguments of one call of render and the results are returned in the order of the tasks
+#initializer(*initargs) runs once in every worker process, e.g. to set the dataset the figures are drawn from, n_jobs=1 renders in the current process instead
+def render_batch(render, tasks, initializer=None, initargs=(), n_jobs=None):
+    tasks = list(tasks)
+    if not tasks:
+        return []
+    if n_jobs == 1:
+        return [render(*task) for task in tasks]
+    workers = n_jobs or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as executor:
+        return list(executor.map(render, *zip(*tasks), chunksize=max(len(tasks) // (workers * 4), 1)))
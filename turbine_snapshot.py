@@ -0,0 +1,116 @@
+###Importing the libraries
+import os
+import hashlib
+import inspect
+import tempfile
+
+#pyarrow is optional, without it the snapshot cache is disabled and the dataset is always rebuilt from the csv
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+###Snapshot settings
+#Directory the snapshots are written to, next to the analysis script
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.snapshots')
+#Bumping this version invalidates every existing snapshot, e.g. when the on-disk layout changes
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+###Snapshot keys
+#Function that hashes the contents of a file in fixed size chunks so large csv files are never read into memory at once
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+#Function that hashes the source code of the modules (or functions) holding the cleaning rules
+def rules_digest(*rules):
+    digest = hashlib.sha256()
+    digest.update(f'format-{SNAPSHOT_FORMAT_VERSION}'.encode())
+    for rule in rules:
+        digest.update(inspect.getsource(rule).encode())
+    return digest.hexdigest()
+
+#Function that returns the name files cached for a source file are keyed by, its file name without the extension
+def source_name(source_path):
+    return os.path.splitext(os.path.basename(source_path))[0]
+
+#Function that builds the snapshot key from the source file and the source code of the modules holding the cleaning rules, so editing either one produces a new key
+def snapshot_key(source_path, *rules):
+    digest = hashlib.sha256()
+    digest.update(file_digest(source_path).encode())
+    digest.update(rules_digest(*rules).encode())
+    #keeping the source file name in the key so snapshots of different files can be told apart and pruned
+    return f'{source_name(source_path)}-{digest.hexdigest()[:32]}'
+
+#Function that returns the path of the snapshot file for a snapshot key
+def snapshot_path(key):
+    return os.path.join(SNAPSHOT_DIR, f'{key}.arrow')
+
+
+###Reading and writing Arrow files
+#Function that creates a uniquely named temporary file next to a path, so processes writing the same file at the same time never write to the same temporary file
+def temporary_file(path):
+    descriptor, temporary_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=f'{os.path.basename(path)}.', suffix='.tmp')
+    os.close(descriptor)
+    return temporary_path
+
+#Function that writes a dataframe to an uncompressed Arrow IPC file, returning None when pyarrow is not installed
+def write_frame(frame, path):
+    if pa is None:
+        return None
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    #writing to a temporary file first so an interrupted run never leaves a half written file behind
+    temporary_path = temporary_file(path)
+    try:
+        with pa.OSFile(temporary_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+    return path
+
+#Function that reads an Arrow IPC file, optionally limited to the given columns, returning None when the file or pyarrow is missing
+#Columns handed over without a copy are read-only, writable=True copies them so the dataframe can be changed in place
+def read_frame(path, columns=None, writable=False):
+    if pa is None or not os.path.exists(path):
+        return None
+    #memory mapping the file means only the selected columns are paged in, and numeric columns without nulls are handed to pandas without being copied
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if columns is not None:
+        table = table.select(list(columns))
+    if writable:
+        return table.to_pandas()
+    return table.to_pandas(split_blocks=True)
+
+
+###Saving and loading snapshots
+#Function that saves the cleaned dataset as a snapshot and removes older snapshots of the same source file
+def save_snapshot(dataset, key):
+    path = write_frame(dataset, snapshot_path(key))
+    if path is not None:
+        prune_snapshots(key)
+    return path
+
+#Function that loads a snapshot, optionally limited to the given columns, returning None when there is no snapshot for the key
+def load_snapshot(key, columns=None, writable=False):
+    return read_frame(snapshot_path(key), columns, writable)
+
+#Function that removes the snapshots (and the files saved next to them, like the spatial index) of the same source file that do not match the current key
+def prune_snapshots(key):
+    source_name = key.rsplit('-', 1)[0]
+    for file_name in os.listdir(SNAPSHOT_DIR):
+        stem, extension = os.path.splitext(file_name)
+        if extension in ['.arrow', '.kdtree'] and stem != key and stem.rsplit('-', 1)[0] == source_name:
+            #another process may have pruned the same file already
+            try:
+                os.remove(os.path.join(SNAPSHOT_DIR, file_name))
+            except FileNotFoundError:
+                pass
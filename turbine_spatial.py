@@ -0,0 +1,184 @@
+###Importing the libraries
+import os
+import pickle
+import numpy as np
+import pandas as pd
+import turbine_snapshot
+from turbine_profiling import stage
+
+
+###Spatial settings
+#Mean radius of the earth in km
+EARTH_RADIUS_KM = 6371.0088
+#Columns of the cleaned dataset holding the turbine coordinates
+LONGITUDE_COLUMN = 'xlong'
+LATITUDE_COLUMN = 'ylat'
+
+#The spatial index of the current dataset, regions passed to the graph functions are resolved with it
+_index = None
+#The current dataset and its snapshot key, kept to load or build the index on first use
+_dataset = None
+_key = None
+
+
+###Building the index
+#Function that turns longitudes and latitudes in degrees into points on the unit sphere, where the straight line (chord) distance between two points only depends on their great circle distance
+def to_unit_vectors(longitudes, latitudes):
+    longitudes = np.radians(np.asarray(longitudes, dtype=float))
+    latitudes = np.radians(np.asarray(latitudes, dtype=float))
+    return np.column_stack([np.cos(latitudes) * np.cos(longitudes), np.cos(latitudes) * np.sin(longitudes), np.sin(latitudes)])
+
+#Function that converts great circle distances in km to chord distances on the unit sphere
+def km_to_chord(distances):
+    return 2 * np.sin(np.minimum(np.asarray(distances, dtype=float) / EARTH_RADIUS_KM, np.pi) / 2)
+
+#Function that converts chord distances on the unit sphere to great circle distances in km
+def chord_to_km(chords):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(np.asarray(chords, dtype=float) / 2, 1.0))
+
+#Function that builds the spatial index of the turbines with coordinates: a KD-tree over their unit sphere points and their latitudes sorted for bounding box queries
+#All queries return row positions in the dataset (usable with dataset.iloc)
+def build_spatial_index(dataset):
+    #scipy is only imported on first use so importing this module stays cheap
+    from scipy.spatial import cKDTree
+    longitudes = dataset[LONGITUDE_COLUMN].to_numpy(dtype=float)
+    latitudes = dataset[LATITUDE_COLUMN].to_numpy(dtype=float)
+    rows = np.flatnonzero(~(np.isnan(longitudes) | np.isnan(latitudes)))
+    latitude_order = rows[np.argsort(latitudes[rows], kind='stable')]
+    return {'tree': cKDTree(to_unit_vectors(longitudes[rows], latitudes[rows])), 'rows': rows, 'size': len(dataset),
+            'longitudes': longitudes, 'latitudes': latitudes, 'latitude_order': latitude_order, 'sorted_latitudes': latitudes[latitude_order]}
+
+
+###Saving and loading the index
+#Function that returns the path of the spatial index saved next to the snapshot with the given key
+def spatial_index_path(key):
+    return os.path.join(turbine_snapshot.SNAPSHOT_DIR, f'{key}.kdtree')
+
+#Function that saves the spatial index next to the snapshot of the same dataset
+def save_spatial_index(index, key):
+    path = spatial_index_path(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    #writing to a uniquely named temporary file first so an interrupted run or another process saving the same index never leaves a half written file behind
+    temporary_path = turbine_snapshot.temporary_file(path)
+    try:
+        with open(temporary_path, 'wb') as file:
+            pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+    return path
+
+#Function that loads the spatial index saved with a snapshot, returning None when there is none
+def load_spatial_index(key):
+    path = spatial_index_path(key)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as file:
+        return pickle.load(file)
+
+#Function that sets the dataset regions are resolved against, its index is only loaded or built by the first spatial query unless an index of the dataset is given
+def set_spatial_dataset(dataset, key=None, index=None):
+    global _index, _dataset, _key
+    _index = index
+    _dataset = dataset
+    _key = key
+
+#Function that returns the spatial index of the current dataset, loading its saved index when there is one for the snapshot key and building (and saving) it otherwise
+def get_spatial_index():
+    global _index
+    if _index is None:
+        if _dataset is None:
+            raise RuntimeError('No dataset has been set for the spatial index, call set_spatial_dataset(dataset) first')
+        index = load_spatial_index(_key) if _key is not None else None
+        if index is None or index['size'] != len(_dataset):
+            with stage('spatial.build_index', len(_dataset)):
+                index = build_spatial_index(_dataset)
+            if _key is not None:
+                save_spatial_index(index, _key)
+        _index = index
+    return _index
+
+
+###Batch queries
+#Function that returns, for every query point, the row positions of the turbines within radius_km of it
+def within_radius(longitudes, latitudes, radius_km, index=None):
+    index = index or get_spatial_index()
+    points = to_unit_vectors(np.atleast_1d(longitudes), np.atleast_1d(latitudes))
+    matches = index['tree'].query_ball_point(points, km_to_chord(np.broadcast_to(radius_km, len(points))), workers=-1)
+    return [np.sort(index['rows'][match]) for match in matches]
+
+#Function that returns, for every query point, the number of turbines within radius_km of it without collecting their positions
+def count_within_radius(longitudes, latitudes, radius_km, index=None):
+    index = index or get_spatial_index()
+    points = to_unit_vectors(np.atleast_1d(longitudes), np.atleast_1d(latitudes))
+    return index['tree'].query_ball_point(points, km_to_chord(np.broadcast_to(radius_km, len(points))), workers=-1, return_length=True)
+
+#Function that returns the distances in km and row positions of the k nearest turbines of every query point, as arrays of shape (points, k)
+def nearest(longitudes, latitudes, k=1, index=None):
+    index = index or get_spatial_index()
+    points = to_unit_vectors(np.atleast_1d(longitudes), np.atleast_1d(latitudes))
+    k = min(k, len(index['rows']))
+    chords, positions = index['tree'].query(points, k=k, workers=-1)
+    return chord_to_km(chords).reshape(len(points), k), index['rows'][positions].reshape(len(points), k)
+
+#Function that returns, for every bounding box, the row positions of the turbines inside it, boxes crossing the antimeridian have west > east
+def bounding_box(west, south, east, north, index=None):
+    index = index or get_spatial_index()
+    west, south, east, north = np.broadcast_arrays(*(np.atleast_1d(np.asarray(value, dtype=float)) for value in (west, south, east, north)))
+    #the sorted latitudes narrow every box down to a contiguous slice of candidates before the longitudes are checked
+    starts = np.searchsorted(index['sorted_latitudes'], south, side='left')
+    stops = np.searchsorted(index['sorted_latitudes'], north, side='right')
+    results = []
+    for box in range(len(west)):
+        candidates = index['latitude_order'][starts[box]:stops[box]]
+        longitudes = index['longitudes'][candidates]
+        if west[box] <= east[box]:
+            inside = (longitudes >= west[box]) & (longitudes <= east[box])
+        else:
+            inside = (longitudes >= west[box]) | (longitudes <= east[box])
+        results.append(np.sort(candidates[inside]))
+    return results
+
+#Function that counts the turbines in every cell of a regular longitude/latitude grid, with the cell area and the turbine density per 1000 km2
+#rows limits the aggregate to some row positions (e.g. a region), and value_column adds the average of a numerical column per cell
+def grid_density(dataset, cell_size=1.0, rows=None, value_column=None, index=None):
+    index = index or get_spatial_index()
+    rows = index['rows'] if rows is None else np.intersect1d(rows, index['rows'])
+    cell_longitudes = np.floor(index['longitudes'][rows] / cell_size) * cell_size
+    cell_latitudes = np.floor(index['latitudes'][rows] / cell_size) * cell_size
+    cells = pd.DataFrame({'cell_longitude': cell_longitudes, 'cell_latitude': cell_latitudes})
+    if value_column is not None:
+        cells[value_column] = dataset[value_column].to_numpy()[rows]
+    grouped = cells.groupby(['cell_longitude', 'cell_latitude'])
+    density = grouped.size().rename('turbines').to_frame()
+    if value_column is not None:
+        density[f'average_{value_column}'] = grouped[value_column].mean()
+    density = density.reset_index()
+    #area of a longitude/latitude cell on a sphere
+    south = np.radians(density['cell_latitude'].to_numpy())
+    north = np.radians(np.minimum(density['cell_latitude'].to_numpy() + cell_size, 90))
+    density['area_km2'] = EARTH_RADIUS_KM ** 2 * np.radians(cell_size) * (np.sin(north) - np.sin(south))
+    density['turbines_per_1000_km2'] = density['turbines'] / density['area_km2'] * 1000
+    return density
+
+
+###Regions
+##A region is a hashable description of an area that the graph and aggregation functions accept as a spatial filter
+
+#Function that describes the area within radius_km of a point
+def radius_region(longitude, latitude, radius_km):
+    return ('radius', float(longitude), float(latitude), float(radius_km))
+
+#Function that describes a bounding box, boxes crossing the antimeridian have west > east
+def box_region(west, south, east, north):
+    return ('box', float(west), float(south), float(east), float(north))
+
+#Function that returns the row positions of the turbines inside a region
+def region_rows(region, index=None):
+    kind, *arguments = region
+    if kind == 'radius':
+        return within_radius(*arguments, index=index)[0]
+    if kind == 'box':
+        return bounding_box(*arguments, index=index)[0]
+    raise ValueError(f"Unknown region type '{kind}', use radius_region or box_region")
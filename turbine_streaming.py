@@ -0,0 +1,151 @@
+###Importing the libraries
+import math
+import os
+import numpy as np
+import pandas as pd
+from turbine_cleaning import rename_columns, replace_missing_labels
+from turbine_imputation import (DIMENSION_COLUMNS, MISSING_VALUE, impute_by_year, impute_project_year, project_year_fill_value,
+                                project_year_statistics)
+
+#pyarrow is optional, it is only needed to write the cleaned chunks to an Arrow file instead of a csv
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+
+###Streaming settings
+#Default memory ceiling for a streaming run in bytes
+DEFAULT_MEMORY_LIMIT = 256 * 1024 * 1024
+#Number of copies of a chunk that are alive at the same time while it is being cleaned, used to turn the memory ceiling into a chunk size
+CHUNK_WORKING_COPIES = 4
+#Placeholder year given to rows with a missing project year during the first pass, before the year they are filled with is known
+PENDING_YEAR = 0
+
+
+###Chunked reading
+#Function that works out how many csv rows fit in a chunk under the memory ceiling from the in-memory size of a sample of rows
+def chunk_rows_for_memory_limit(source_path, memory_limit=DEFAULT_MEMORY_LIMIT, sample_rows=1000):
+    sample = pd.read_csv(source_path, nrows=sample_rows)
+    bytes_per_row = sample.memory_usage(index=True, deep=True).sum() / max(len(sample), 1)
+    return max(int(memory_limit / (bytes_per_row * CHUNK_WORKING_COPIES)), 1)
+
+#Function that reads the csv in chunks with the given column dtypes
+def read_chunks(source_path, chunk_rows, dtype=None):
+    return pd.read_csv(source_path, chunksize=chunk_rows, dtype=dtype)
+
+#Function that returns a single dtype for a column from the dtypes it was read with in different chunks, the same way reading the whole file at once would
+def _combine_dtypes(dtypes):
+    if all(dtype == dtypes[0] for dtype in dtypes):
+        return dtypes[0]
+    if all(pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) for dtype in dtypes):
+        return np.result_type(*dtypes)
+    return object
+
+
+###Exact running sums
+#Function that adds a float to a list of non-overlapping partial sums without any rounding error (Shewchuk's algorithm, the one math.fsum is built on)
+def _add_exact(partials, value):
+    kept = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[kept] = low
+            kept += 1
+        value = high
+    partials[kept:] = [value]
+
+#Function that adds the reported dimension values of a chunk to the exact per-year partial sums and counts
+def _add_chunk_statistics(partials, counts, dataset):
+    values = dataset[DIMENSION_COLUMNS].replace(MISSING_VALUE, np.nan)
+    for year, group in values.groupby(dataset['project_year']):
+        for column in DIMENSION_COLUMNS:
+            column_values = group[column].to_numpy(dtype=float)
+            column_values = column_values[~np.isnan(column_values)]
+            #the correctly rounded sum of the chunk and its rounding error together hold the exact sum of the chunk
+            chunk_sum = math.fsum(column_values)
+            chunk_error = math.fsum(np.append(column_values, -chunk_sum))
+            key = (year, column)
+            _add_exact(partials.setdefault(key, []), chunk_sum)
+            _add_exact(partials[key], chunk_error)
+            counts[key] = counts.get(key, 0) + len(column_values)
+
+
+###Streaming cleaning
+#Function that runs the first pass over the csv, collecting the column dtypes and the statistics the project year and dimension imputation need
+def collect_statistics(source_path, chunk_rows):
+    dtypes = {}
+    project_statistics = None
+    partials = {}
+    counts = {}
+    for chunk in read_chunks(source_path, chunk_rows):
+        for column, dtype in chunk.dtypes.items():
+            dtypes.setdefault(column, []).append(dtype)
+        rows = replace_missing_labels(rename_columns(chunk))
+        chunk_project_statistics = project_year_statistics(rows)
+        project_statistics = chunk_project_statistics if project_statistics is None else project_statistics + chunk_project_statistics
+        #rows without a year are kept under a placeholder year until the year they are filled with is known
+        rows = impute_project_year(rows, fill_value=PENDING_YEAR)
+        _add_chunk_statistics(partials, counts, rows)
+
+    ##Moving the rows without a year to the year they are filled with, or leaving them out when they are dropped
+    fill_year = project_year_fill_value(project_statistics)
+    for column in DIMENSION_COLUMNS:
+        pending = (PENDING_YEAR, column)
+        if pending not in partials:
+            continue
+        pending_partials = partials.pop(pending)
+        pending_count = counts.pop(pending)
+        if not pd.isna(fill_year):
+            key = (fill_year, column)
+            for partial in pending_partials:
+                _add_exact(partials.setdefault(key, []), partial)
+            counts[key] = counts.get(key, 0) + pending_count
+    keys = pd.MultiIndex.from_tuples(list(partials), names=['project_year', None])
+    sums = pd.Series([math.fsum(partials[key]) for key in partials], index=keys).unstack().reindex(columns=DIMENSION_COLUMNS)
+    year_counts = pd.Series([counts[key] for key in partials], index=keys).unstack().reindex(columns=DIMENSION_COLUMNS)
+    dtypes = {column: _combine_dtypes(column_dtypes) for column, column_dtypes in dtypes.items()}
+    return dtypes, project_statistics, (sums.sort_index(), year_counts.sort_index())
+
+#Function that cleans the United States Wind Turbine Database csv in chunks under a memory ceiling, writing the cleaned rows to a csv or Arrow file
+#The first pass builds the grouped statistics of the imputation, the second fills and writes every chunk, giving the same rows as clean_dataset on the whole file
+#The year sums of the first pass are exact while clean_dataset uses the vectorized pandas sum, so imputed values can differ from it in their last bit (relative difference below 1e-12)
+def clean_csv_streaming(source_path, output_path, memory_limit=DEFAULT_MEMORY_LIMIT, chunk_rows=None):
+    if chunk_rows is None:
+        chunk_rows = chunk_rows_for_memory_limit(source_path, memory_limit)
+    dtypes, project_statistics, statistics = collect_statistics(source_path, chunk_rows)
+    write_arrow = os.path.splitext(output_path)[1] in ['.arrow', '.feather']
+    if write_arrow and pa is None:
+        raise ImportError('pyarrow is required to write the cleaned dataset to an Arrow file')
+    temporary_path = f'{output_path}.tmp'
+    writer = None
+    sink = None
+    rows_written = 0
+    try:
+        for chunk in read_chunks(source_path, chunk_rows, dtype=dtypes):
+            rows = replace_missing_labels(rename_columns(chunk))
+            rows = impute_project_year(rows, project_statistics)
+            rows = impute_by_year(rows, DIMENSION_COLUMNS, statistics=statistics)
+            if write_arrow:
+                table = pa.Table.from_pandas(rows, preserve_index=False)
+                if writer is None:
+                    #columns that are empty in the first chunk have no type yet, they hold text in the cleaned dataset
+                    schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in table.schema])
+                    sink = pa.OSFile(temporary_path, 'wb')
+                    writer = pa.ipc.new_file(sink, schema)
+                writer.write_table(table.cast(schema))
+            else:
+                rows.to_csv(temporary_path, mode='w' if rows_written == 0 else 'a', header=rows_written == 0, index=False)
+            rows_written += len(rows)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+    if rows_written == 0:
+        return 0
+    os.replace(temporary_path, output_path)
+    return rows_written
@@ -0,0 +1,187 @@
+###Importing the libraries
+import os
+import numpy as np
+import pandas as pd
+from turbine_imputation import MISSING_VALUE
+
+
+###Synthetic data settings
+#Approximate number of turbines in recent USWTDB releases, the 1x scale of the synthetic datasets
+USWTDB_ROW_COUNT = 75000
+#Rows generated at a time when a synthetic dataset is written to a csv, so 100x datasets never have to fit in memory at once
+GENERATION_CHUNK_ROWS = 500000
+#Average number of turbines in a project
+TURBINES_PER_PROJECT = 45
+#Columns of a USWTDB release in the order of the csv
+USWTDB_COLUMNS = ['case_id', 'faa_ors', 'faa_asn', 'usgs_pr_id', 'eia_id', 't_state', 't_county', 't_fips', 'p_name', 'p_year', 'p_tnum', 'p_cap', 't_manu', 't_model',
+                  't_cap', 't_hh', 't_rd', 't_rsa', 't_ttlh', 'retrofit', 'retrofit_year', 't_conf_atr', 't_conf_loc', 't_img_date', 't_img_srce', 'xlong', 'ylat']
+
+#Share of the turbines, FIPS code and approximate center of the wind projects (longitude, latitude) of every state
+STATES = {'TX': (0.230, 48, -100.5, 32.8), 'IA': (0.085, 19, -94.2, 42.6), 'OK': (0.070, 40, -98.8, 35.9), 'KS': (0.050, 20, -98.9, 38.2),
+          'CA': (0.070, 6, -117.8, 35.0), 'IL': (0.045, 17, -88.9, 40.6), 'MN': (0.040, 27, -95.8, 44.3), 'CO': (0.035, 8, -103.6, 39.8),
+          'ND': (0.030, 38, -100.6, 47.1), 'WY': (0.030, 56, -106.2, 41.9), 'OR': (0.028, 41, -120.2, 45.6), 'WA': (0.027, 53, -120.1, 46.4),
+          'NM': (0.030, 35, -104.2, 34.6), 'IN': (0.022, 18, -87.0, 40.5), 'NE': (0.020, 31, -98.9, 41.4), 'MI': (0.020, 26, -83.3, 43.6),
+          'SD': (0.020, 46, -99.7, 44.2), 'NY': (0.017, 36, -75.4, 43.0), 'MT': (0.014, 30, -109.4, 47.2), 'PA': (0.012, 42, -78.7, 40.4),
+          'ID': (0.010, 16, -114.5, 43.0), 'ME': (0.008, 23, -69.3, 45.0), 'MO': (0.010, 29, -94.4, 40.2), 'OH': (0.008, 39, -83.7, 40.8),
+          'WV': (0.006, 54, -79.5, 39.0), 'WI': (0.006, 55, -88.7, 43.6), 'VT': (0.002, 50, -72.6, 44.3), 'UT': (0.003, 49, -113.0, 38.6),
+          'HI': (0.002, 15, -156.4, 20.8), 'AZ': (0.003, 4, -110.5, 34.9), 'NH': (0.002, 33, -71.6, 44.0), 'MA': (0.002, 25, -70.9, 41.9)}
+#Relative number of turbines installed every year from 1981 to 2023, following the build-out of US wind power
+YEAR_WEIGHTS = {1981: 1, 1982: 3, 1983: 6, 1984: 10, 1985: 10, 1986: 5, 1987: 4, 1988: 3, 1989: 3, 1990: 3, 1991: 2, 1992: 2, 1993: 1, 1994: 2, 1995: 2,
+                1996: 1, 1997: 1, 1998: 7, 1999: 9, 2000: 3, 2001: 16, 2002: 5, 2003: 16, 2004: 4, 2005: 15, 2006: 16, 2007: 28, 2008: 48, 2009: 53,
+                2010: 29, 2011: 36, 2012: 72, 2013: 5, 2014: 26, 2015: 45, 2016: 49, 2017: 40, 2018: 40, 2019: 47, 2020: 60, 2021: 56, 2022: 30, 2023: 20}
+#Typical turbine capacity in kW of the projects of a year, interpolated between these years
+CAPACITY_TREND = {1981: 50, 1990: 100, 1995: 300, 2000: 750, 2005: 1500, 2010: 1650, 2015: 2000, 2020: 2800, 2023: 3400}
+#Relative share of every manufacturer, the years it installed turbines in, its model prefix and the capacity of all its turbines (None follows the year trend)
+#The fixed capacities are the special cases the project year imputation relies on
+MANUFACTURERS = {'GE Wind': (40, 2002, 2023, 'GE', None), 'Vestas': (28, 1981, 2023, 'V', None), 'Siemens': (8, 2005, 2017, 'SWT-', None),
+                 'Siemens Gamesa Renewable Energy': (6, 2017, 2023, 'SG ', None), 'Mitsubishi': (4, 1983, 2015, 'MWT', None), 'Gamesa': (3, 2005, 2016, 'G', None),
+                 'Suzlon': (2, 2006, 2013, 'S', None), 'Nordex': (3, 2000, 2023, 'N', None), 'Kenetech': (4, 1981, 1998, 'KVS-', None),
+                 'Micon': (2, 1983, 1998, 'M', None), 'Zond': (2, 1983, 2001, 'Z-', None), 'Westinghouse': (1, 1985, 1990, 'WWG-', 600),
+                 'Northern Power Systems': (1, 1981, 2023, 'NPS ', 100), 'Seaforth': (1, 1981, 1986, 'AOC ', 60), 'Senivon USA Corp': (1, 2010, 2023, 'SE', 3200)}
+#Words project names are made of
+PROJECT_WORDS = ['Prairie', 'Ridge', 'Mesa', 'Windy', 'Eagle', 'Buffalo', 'Cedar', 'Big', 'Sky', 'Rolling', 'Hills', 'Red', 'Canyon', 'Flat', 'Stone',
+                 'Horse', 'Creek', 'Blue', 'Lone', 'Star', 'High', 'Plains', 'Bear', 'Grand', 'Meadow', 'Twin', 'Oak', 'Thunder', 'Cotton', 'Iron']
+#Names counties are made of
+COUNTY_NAMES = ['Adams', 'Benton', 'Carson', 'Dawson', 'Ellis', 'Fayette', 'Grant', 'Hale', 'Jackson', 'Kern', 'Lincoln', 'Madison', 'Nolan', 'Otero',
+                'Pecos', 'Randall', 'Story', 'Taylor', 'Union', 'Webster', 'Washington', 'Franklin', 'Clay', 'Logan', 'Marion', 'Morgan', 'Scott', 'Wayne']
+#Sources of the imagery the turbine locations were checked on
+IMAGE_SOURCES = ['Digital Globe', 'NAIP', 'Bing Maps Aerial', 'Google Earth']
+
+
+###Generating projects
+#Function that draws one manufacturer per project from the manufacturers installing turbines in the project year
+def _draw_manufacturers(generator, years):
+    names = list(MANUFACTURERS)
+    weights = np.array([[share if first <= year <= last else 0 for share, first, last, _, _ in MANUFACTURERS.values()] for year in YEAR_WEIGHTS], dtype=float)
+    cumulative = np.cumsum(weights / weights.sum(axis=1, keepdims=True), axis=1)
+    year_rows = years - min(YEAR_WEIGHTS)
+    choices = (cumulative[year_rows] < generator.random(len(years))[:, None]).sum(axis=1)
+    return np.array(names)[np.minimum(choices, len(names) - 1)]
+
+#Function that generates the projects of a synthetic release, every project shares its state, year, manufacturer, model and turbine dimensions
+def _generate_projects(generator, projects):
+    states = list(STATES)
+    state_shares = np.array([STATES[state][0] for state in states])
+    state = generator.choice(len(states), projects, p=state_shares / state_shares.sum())
+    years = np.array(list(YEAR_WEIGHTS))
+    year_weights = np.array(list(YEAR_WEIGHTS.values()), dtype=float)
+    year = generator.choice(years, projects, p=year_weights / year_weights.sum())
+    manufacturer = _draw_manufacturers(generator, year)
+
+    ##Turbine dimensions, the capacity follows the year trend and the rotor and tower grow with it
+    trend = np.interp(year, list(CAPACITY_TREND), list(CAPACITY_TREND.values()))
+    capacity = np.round(trend * generator.lognormal(0, 0.2, projects) / 10) * 10
+    fixed_capacity = np.array([MANUFACTURERS[name][4] or np.nan for name in manufacturer], dtype=float)
+    capacity = np.where(np.isnan(fixed_capacity), np.maximum(capacity, 20), fixed_capacity)
+    rotor_diameter = np.round(2.1 * np.sqrt(capacity) * generator.normal(1, 0.05, projects), 1)
+    hub_height = np.round(np.maximum(0.85 * rotor_diameter + 10 + generator.normal(0, 5, projects), 15), 1)
+    prefixes = np.array([MANUFACTURERS[name][3] for name in manufacturer])
+    model = pd.Series(prefixes) + pd.Series(capacity / 1000).map('{:g}'.format) + '-' + pd.Series(np.round(rotor_diameter).astype(int).astype(str))
+
+    ##Project names, unique within a release
+    words = np.array(PROJECT_WORDS)
+    names = pd.Series(words[generator.integers(0, len(words), projects)]) + ' ' + pd.Series(words[generator.integers(0, len(words), projects)]) + ' Wind'
+    phase = names.groupby(names).cumcount()
+    names = names.where(phase == 0, names + ' ' + (phase + 1).astype(str))
+    county = generator.integers(0, len(COUNTY_NAMES), projects)
+    return pd.DataFrame({'state': np.array(states)[state], 'state_index': state, 'year': year, 'manufacturer': manufacturer, 'model': model,
+                         'capacity': capacity, 'rotor_diameter': rotor_diameter, 'hub_height': hub_height, 'name': names, 'county': county,
+                         'longitude': np.array([STATES[states[index]][2] for index in state]) + generator.normal(0, 1.5, projects),
+                         'latitude': np.array([STATES[states[index]][3] for index in state]) + generator.normal(0, 1.0, projects)})
+
+
+###Generating turbines
+#Function that replaces values by a sentinel with the given probability for every row
+def _with_sentinel(generator, values, probability, sentinel):
+    values = np.asarray(values, dtype=object if isinstance(sentinel, str) else float)
+    return np.where(generator.random(len(values)) < probability, sentinel, values)
+
+#Function that generates a synthetic release with the schema of the United States Wind Turbine Database, including its -9999 and 'missing' sentinels
+#Dimensions are reported less often for older projects, a few project years are missing, and the special cases of the project year imputation (the fixed capacity manufacturers and Scioto Ridge) are present
+def generate_dataset(rows=USWTDB_ROW_COUNT, seed=0, first_case_id=3000001):
+    generator = np.random.default_rng(seed)
+    projects = _generate_projects(generator, max(rows // TURBINES_PER_PROJECT, 1))
+    #a Siemens Gamesa project on Scioto Ridge without a project year, filled with 2020 by the cleaning
+    projects.loc[0, ['name', 'manufacturer', 'model', 'year', 'capacity', 'rotor_diameter', 'hub_height']] = ['Scioto Ridge', 'Siemens Gamesa Renewable Energy', 'SG 2.1-114',
+                                                                                                              2019, 2100, 114.0, 90.0]
+    sizes = generator.lognormal(0, 0.9, len(projects))
+    sizes[0] = sizes.mean()
+    turbines = generator.multinomial(rows, sizes / sizes.sum())
+    #project of every turbine
+    project = np.repeat(np.arange(len(projects)), turbines)
+    turbine_projects = projects.take(project)
+
+    ##Project level values and sentinels, whole projects tend to be missing the same values
+    year = projects['year'].to_numpy()
+    project_year = np.where(generator.random(len(projects)) < 0.004, MISSING_VALUE, year).astype(float)
+    project_year[0] = MISSING_VALUE
+    #older projects report their dimensions less often
+    missing_rate = np.select([year < 1990, year < 2000, year < 2010], [0.6, 0.3, 0.08], 0.02)
+    dimensions = {}
+    for column, rate in [('capacity', 0.2), ('hub_height', 1.0), ('rotor_diameter', 1.0)]:
+        dimensions[column] = generator.random(len(projects)) < missing_rate * rate
+    manufacturer = np.where(generator.random(len(projects)) < missing_rate * 0.5, 'missing', projects['manufacturer'].to_numpy())
+    model = np.where((manufacturer == 'missing') | (generator.random(len(projects)) < 0.02), 'missing', projects['model'].to_numpy())
+    name = np.where(generator.random(len(projects)) < 0.01, 'unknown ' + projects['state'] + ' project ' + pd.Series(np.arange(len(projects))).astype(str),
+                    projects['name'])
+    #keeping the Scioto Ridge project recognisable
+    manufacturer[0], model[0], name[0] = projects.loc[0, ['manufacturer', 'model', 'name']]
+    retrofit = (generator.random(len(projects)) < 0.05) & (year < 2012)
+    retrofit_year = np.where(retrofit, generator.integers(2016, 2023, len(projects)), MISSING_VALUE)
+    eia_id = _with_sentinel(generator, (56000 + np.arange(len(projects))).astype(str), 0.05, 'missing')
+    usgs_pr_id = _with_sentinel(generator, (10000 + np.arange(len(projects))).astype(str), 0.1, 'missing')
+
+    ##Turbine level values
+    capacity = turbine_projects['capacity'].to_numpy()
+    rotor_diameter = turbine_projects['rotor_diameter'].to_numpy()
+    hub_height = turbine_projects['hub_height'].to_numpy()
+    swept_area = np.round(np.pi * (rotor_diameter / 2) ** 2, 2)
+    total_height = np.round(hub_height + rotor_diameter / 2, 1)
+    capacity_missing = dimensions['capacity'][project] | (generator.random(rows) < 0.002)
+    rotor_missing = dimensions['rotor_diameter'][project] | (generator.random(rows) < 0.005)
+    hub_missing = dimensions['hub_height'][project] | (generator.random(rows) < 0.005)
+    state_index = turbine_projects['state_index'].to_numpy()
+    county = turbine_projects['county'].to_numpy()
+    dataset = pd.DataFrame({
+        'case_id': first_case_id + np.arange(rows),
+        'faa_ors': _with_sentinel(generator, pd.Series(state_index).astype(str) + '-' + pd.Series(generator.integers(1000, 99999, rows)).astype(str), 0.3, 'missing'),
+        'faa_asn': _with_sentinel(generator, pd.Series(year[project]).astype(str) + '-WTE-' + pd.Series(generator.integers(100, 9999, rows)).astype(str), 0.3, 'missing'),
+        'usgs_pr_id': usgs_pr_id[project],
+        'eia_id': eia_id[project],
+        't_state': turbine_projects['state'].to_numpy(),
+        't_county': np.array(COUNTY_NAMES)[county] + ' County',
+        't_fips': np.array([STATES[state][1] for state in STATES])[state_index] * 1000 + county * 2 + 1,
+        'p_name': name[project],
+        'p_year': project_year[project],
+        'p_tnum': turbines[project],
+        'p_cap': np.round(turbines * projects['capacity'].to_numpy() / 1000, 2)[project],
+        't_manu': manufacturer[project],
+        't_model': model[project],
+        't_cap': np.where(capacity_missing, MISSING_VALUE, capacity),
+        't_hh': np.where(hub_missing, MISSING_VALUE, hub_height),
+        't_rd': np.where(rotor_missing, MISSING_VALUE, rotor_diameter),
+        't_rsa': np.where(rotor_missing, MISSING_VALUE, swept_area),
+        't_ttlh': np.where(hub_missing | rotor_missing, MISSING_VALUE, total_height),
+        'retrofit': retrofit[project].astype(int),
+        'retrofit_year': retrofit_year[project],
+        't_conf_atr': generator.choice([1, 2, 3], rows, p=[0.05, 0.15, 0.8]),
+        't_conf_loc': generator.choice([1, 2, 3], rows, p=[0.02, 0.08, 0.9]),
+        't_img_date': pd.Series(generator.integers(1, 13, rows)).astype(str) + '/1/' + pd.Series(np.maximum(year[project] + 1, 2008)).astype(str),
+        't_img_srce': np.array(IMAGE_SOURCES)[generator.integers(0, len(IMAGE_SOURCES), rows)],
+        'xlong': turbine_projects['longitude'].to_numpy() + generator.normal(0, 0.03, rows),
+        'ylat': turbine_projects['latitude'].to_numpy() + generator.normal(0, 0.03, rows)})
+    return dataset[USWTDB_COLUMNS]
+
+#Function that writes a synthetic release of the given number of rows to a csv, generating it in chunks with their own seeds spawned from the given seed
+def write_dataset(path, rows=USWTDB_ROW_COUNT, seed=0, chunk_rows=GENERATION_CHUNK_ROWS):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    starts = range(0, rows, chunk_rows)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    #writing to a temporary file first so an interrupted run never leaves a half written file behind
+    temporary_path = f'{path}.tmp'
+    for start, chunk_seed in zip(starts, seeds):
+        chunk = generate_dataset(min(chunk_rows, rows - start), chunk_seed, 3000001 + start)
+        chunk.to_csv(temporary_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+    os.replace(temporary_path, path)
+    return path